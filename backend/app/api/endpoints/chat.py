@@ -1,50 +1,83 @@
-from fastapi import APIRouter, HTTPException, Request
-from ...services.chat import ChatService
-from ...api.schemas import MessageCreate
-from sse_starlette.sse import EventSourceResponse
-
-router = APIRouter()
-chat_service = ChatService()
-
-@router.post("/send")
-async def send_message(message: MessageCreate):
-    try:
-        response = await chat_service.process_message(message.content)
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@router.get("/stream/{chat_id}")
-async def stream_chat(chat_id: str, request: Request):
-    async def event_generator():
-        try:
-            async for token in chat_service.stream_response(chat_id):
-                if await request.is_disconnected():
-                    break
-                yield {
-                    "event": "message",
-                    "data": token
-                }
-        except Exception as e:
-            yield {
-                "event": "error",
-                "data": str(e)
-            }
-
-    return EventSourceResponse(event_generator())
-
-@router.get("/history")
-async def get_chat_history():
-    try:
-        history = await chat_service.get_chat_history()
-        return history
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@router.post("/clear")
-async def clear_chat_history():
-    try:
-        await chat_service.clear_chat_history()
-        return {"message": "Chat history cleared successfully"}
-    except Exception as e:
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import List, Optional
+from ...api.schemas import MessageCreate
+from ...core.admission import OverloadedError, get_admission_controller
+from sse_starlette.sse import EventSourceResponse
+import json
+
+router = APIRouter()
+
+def chat_service():
+    """Return the shared chat service; it is imported on first use to keep startup fast"""
+    from ...services.chat import get_chat_service
+    return get_chat_service()
+
+@router.post("/send")
+async def send_message(message: MessageCreate):
+    try:
+        response = await chat_service().process_message(message.content, message.document_ids, message.multi_query)
+        return response
+    except OverloadedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stream/{chat_id}")
+async def stream_chat(chat_id: str, question: str, request: Request,
+                      document_ids: Optional[List[str]] = Query(None), multi_query: bool = False):
+    # Refuse before the event stream starts, while a status code can still be sent
+    try:
+        get_admission_controller("llm").check()
+    except OverloadedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    async def event_generator():
+        stream = chat_service().stream_response(chat_id, question, document_ids, multi_query)
+        try:
+            async for item in stream:
+                if await request.is_disconnected():
+                    break
+                if "token" in item:
+                    yield {
+                        "event": "message",
+                        "data": item["token"]
+                    }
+                else:
+                    yield {
+                        "event": "done",
+                        "data": json.dumps(item["chat"])
+                    }
+        except Exception as e:
+            yield {
+                "event": "error",
+                "data": str(e)
+            }
+        finally:
+            # Closing the stream aborts the upstream generation on disconnect
+            await stream.aclose()
+
+    return EventSourceResponse(event_generator())
+
+@router.post("/stop/{chat_id}")
+async def stop_chat(chat_id: str):
+    if not chat_service().stop_generation(chat_id):
+        raise HTTPException(status_code=404, detail="No generation in progress for this chat")
+    return {"message": "Generation stopped"}
+
+@router.get("/history")
+async def get_chat_history(limit: Optional[int] = Query(None, ge=1, le=1000), before: Optional[str] = None,
+                           before_seq: Optional[int] = None):
+    """Newest messages first; pass the last message's timestamp and seq as before and before_seq for the next page"""
+    try:
+        history = await chat_service().get_chat_history(limit, before, before_seq)
+        return history
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/clear")
+async def clear_chat_history():
+    try:
+        await chat_service().clear_chat_history()
+        return {"message": "Chat history cleared successfully"}
+    except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,23 +1,83 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from ...services.pdf import PDFService
-from fastapi.logger import logger
-
-router = APIRouter()
-
-@router.post("/upload")
-async def upload_pdf(file: UploadFile = File(...), pdf_service: PDFService = Depends()):
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="File must be a PDF")
-    
-    try:
-        logger.info(f"Processing PDF file: {file.filename}")
-        content = await file.read()
-        
-        if not content:
-            raise HTTPException(status_code=400, detail="Empty PDF file")
-            
-        await pdf_service.process_pdf(content)
-        return {"message": "PDF processed successfully"}
-    except Exception as e:
-        logger.error(f"Error processing PDF: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from ...services.ingestion import IngestionQueueFullError, get_ingestion_queue
+from ...config import settings
+from fastapi.logger import logger
+import os
+import tempfile
+
+router = APIRouter()
+
+def pdf_service():
+    """Return the shared PDF service; it is imported on first use to keep startup fast"""
+    from ...services.pdf import get_pdf_service
+    return get_pdf_service()
+
+async def spool_upload(file: UploadFile) -> str:
+    """Copy an upload to a temporary file in fixed-size chunks and return its path"""
+    upload_dir = os.path.join(settings.DATA_DIR, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=upload_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+@router.post("/upload", status_code=202)
+async def upload_pdf(file: UploadFile = File(...)):
+    """Queue a PDF for indexing; poll /jobs/{job_id} for progress"""
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    
+    path = None
+    try:
+        logger.info(f"Queueing PDF file: {file.filename}")
+        path = await spool_upload(file)
+        
+        if os.path.getsize(path) == 0:
+            raise HTTPException(status_code=400, detail="Empty PDF file")
+            
+        job = get_ingestion_queue().submit(path, file.filename)
+        # The job now owns the spooled file
+        path = None
+        return {"message": "PDF queued for processing", "job_id": job["id"], "job": job}
+    except HTTPException:
+        raise
+    except IngestionQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        logger.error(f"Error queueing PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    finally:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await get_ingestion_queue().find(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/documents")
+async def list_documents(pdf_service=Depends(pdf_service)):
+    try:
+        return await pdf_service.list_documents()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str, pdf_service=Depends(pdf_service)):
+    try:
+        deleted = await pdf_service.delete_document(doc_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"message": "Document deleted successfully"}
\ No newline at end of file
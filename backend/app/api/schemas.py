@@ -1,11 +1,15 @@
-from pydantic import BaseModel
-from typing import Optional
-
-class MessageCreate(BaseModel):
-    content: str
-
-class Message(BaseModel):
-    id: str
-    question: str
-    answer: str
-    timestamp: str
+from pydantic import BaseModel
+from typing import List, Optional
+
+class MessageCreate(BaseModel):
+    content: str
+    # Restrict retrieval to these documents; all documents when omitted
+    document_ids: Optional[List[str]] = None
+    # Also search with model-generated rephrasings of the question (slower, better recall)
+    multi_query: bool = False
+
+class Message(BaseModel):
+    id: str
+    question: str
+    answer: str
+    timestamp: str
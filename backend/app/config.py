@@ -1,13 +1,78 @@
-from pydantic_settings import BaseSettings
-import os
-
-class Settings(BaseSettings):
-    MODEL_NAME: str = "llama3.2:latest"
-    EMBEDDING_MODEL: str = "mxbai-embed-large"
-    CHUNK_SIZE: int = 7500
-    CHUNK_OVERLAP: int = 100
-    VECTOR_DB_PATH: str = "faiss_index"
-    DATA_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
-    OLLAMA_BASE_URL: str = "http://localhost:11434"
-
+from pydantic_settings import BaseSettings
+import os
+
+class Settings(BaseSettings):
+    MODEL_NAME: str = "llama3.2:latest"
+    EMBEDDING_MODEL: str = "mxbai-embed-large"
+    CHUNK_SIZE: int = 1500
+    CHUNK_OVERLAP: int = 200
+    VECTOR_DB_PATH: str = "faiss_index"
+    DATA_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    EMBEDDING_CACHE_PATH: str = "embedding_cache.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CONCURRENCY: int = 4
+    OLLAMA_TIMEOUT: float = 120.0
+    # How long Ollama keeps the model (and its evaluated prompt prefix) loaded between requests
+    OLLAMA_KEEP_ALIVE: str = "30m"
+    # Admission control per worker: model calls beyond the limit wait in a bounded queue
+    # until the timeout, and are refused once the queue is full
+    LLM_CONCURRENCY: int = 2
+    LLM_QUEUE_SIZE: int = 16
+    LLM_QUEUE_TIMEOUT: float = 30.0
+    EMBEDDING_QUERY_CONCURRENCY: int = 4
+    EMBEDDING_QUEUE_SIZE: int = 64
+    EMBEDDING_QUEUE_TIMEOUT: float = 10.0
+    # Load the index and both models in the background at startup; /api/ready waits for it
+    PREWARM: bool = False
+    PREWARM_RETRY_INTERVAL: float = 5.0
+    READY_TIMEOUT: float = 2.0
+    # Seconds between checks for a stop request made through another worker process
+    STOP_CHECK_INTERVAL: float = 0.25
+    PDF_WORKERS: int = os.cpu_count() or 1
+    PDF_PAGES_PER_TASK: int = 8
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    INGEST_WORKERS: int = 2
+    INGEST_QUEUE_SIZE: int = 16
+    # Seconds a finished ingestion job stays visible on /api/pdf/jobs/{id}
+    INGEST_JOB_RETENTION: float = 3600.0
+    MULTI_DOCUMENT: bool = False
+    SEARCH_FILTER_FETCH_K: int = 200
+    RETRIEVAL_K: int = 5
+    # Candidates taken from each of the dense and BM25 rankings before fusion
+    RETRIEVAL_CANDIDATES: int = 20
+    RRF_K: int = 60
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    # Skip the query embedding when the question names identifiers found verbatim in a chunk
+    LEXICAL_FAST_PATH: bool = True
+    # Upper bound on the rephrased questions used by multi-query retrieval
+    MULTI_QUERY_VARIANTS: int = 2
+    # Fused candidates are re-scored against their stored vectors and query term overlap,
+    # then picked with MMR so overlapping neighbours of the same passage are not all kept
+    RERANK_ENABLED: bool = True
+    RERANK_CANDIDATES: int = 50
+    RERANK_LEXICAL_WEIGHT: float = 0.3
+    RERANK_MMR_LAMBDA: float = 0.7
+    RERANK_DUPLICATE_THRESHOLD: float = 0.95
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_MIN_CHUNK_TOKENS: int = 64
+    CHARS_PER_TOKEN: float = 4.0
+    # One of flat, ivf, hnsw, pq, ivfpq; indexes stay flat until there are enough vectors to train
+    FAISS_INDEX_TYPE: str = "flat"
+    FAISS_NLIST: int = 0
+    FAISS_NPROBE: int = 8
+    FAISS_HNSW_M: int = 32
+    FAISS_EF_CONSTRUCTION: int = 80
+    FAISS_EF_SEARCH: int = 64
+    FAISS_PQ_M: int = 16
+    FAISS_PQ_NBITS: int = 8
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    DATABASE_PATH: str = "offgrid.db"
+    CHAT_HISTORY_PAGE_SIZE: int = 50
+
 settings = Settings()
\ No newline at end of file
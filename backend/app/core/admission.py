@@ -0,0 +1,141 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+import asyncio
+import logging
+import math
+import time
+from ..config import settings
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class OverloadedError(Exception):
+    """Raised when a model call is refused; carries the HTTP status and a retry hint in seconds"""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFullError(OverloadedError):
+    """The wait queue is full, so the call is refused without waiting"""
+    status_code = 429
+
+class QueueTimeoutError(OverloadedError):
+    """The call waited for a slot until its deadline"""
+    status_code = 503
+
+class AdmissionController:
+    """Concurrency limit with a bounded FIFO wait queue in front of a model.
+
+    At most `limit` calls run at once. Further calls wait in order for up to
+    `timeout` seconds, and once `queue_size` calls are waiting new ones are
+    refused straight away, so overload shows up as fast 429/503 responses
+    instead of every request slowing down inside Ollama. A released slot is
+    handed directly to the oldest waiter.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long a call holds its slot, for Retry-After
+        self._hold_seconds = 1.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a new call could expect a slot, from the queue length and recent call times"""
+        return max(1, math.ceil(self._hold_seconds * (self.queue_depth + 1) / self.limit))
+
+    def _report(self) -> None:
+        ADMISSION_ACTIVE.set(self.active, pool=self.name)
+        ADMISSION_QUEUE_DEPTH.set(self.queue_depth, pool=self.name)
+
+    def check(self) -> None:
+        """Refuse early when a call made now would be rejected, without reserving a slot"""
+        if self.active >= self.limit and self.queue_depth >= self.queue_size:
+            ADMISSION_REJECTED.inc(pool=self.name, reason="queue_full")
+            raise QueueFullError(f"Too many requests are waiting for the {self.name} model, please retry later",
+                                 self.retry_after())
+
+    async def acquire(self) -> None:
+        started = time.perf_counter()
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+        else:
+            self.check()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._report()
+            try:
+                await asyncio.wait([waiter], timeout=self.timeout)
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+            if not waiter.done():
+                self._abandon(waiter)
+                ADMISSION_REJECTED.inc(pool=self.name, reason="timeout")
+                logger.warning(f"Gave up waiting {self.timeout}s for the {self.name} model")
+                raise QueueTimeoutError(f"The {self.name} model is busy, please retry later", self.retry_after())
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, pool=self.name)
+        self._report()
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the wait ended; pass it on
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._report()
+
+    def release(self, held_seconds: Optional[float] = None) -> None:
+        if held_seconds is not None:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held_seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the waiter, so the active count does not change
+                waiter.set_result(None)
+                self._report()
+                return
+        self.active -= 1
+        self._report()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one slot for the duration of the block"""
+        await self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+_controllers: Dict[str, AdmissionController] = {}
+
+def get_admission_controller(name: str) -> AdmissionController:
+    """Return the process-wide controller for the "llm" or "embedding" pool"""
+    if name not in _controllers:
+        if name == "llm":
+            _controllers[name] = AdmissionController(
+                name, settings.LLM_CONCURRENCY, settings.LLM_QUEUE_SIZE, settings.LLM_QUEUE_TIMEOUT
+            )
+        elif name == "embedding":
+            _controllers[name] = AdmissionController(
+                name, settings.EMBEDDING_QUERY_CONCURRENCY, settings.EMBEDDING_QUEUE_SIZE,
+                settings.EMBEDDING_QUEUE_TIMEOUT
+            )
+        else:
+            raise ValueError(f"Unknown admission pool: {name}")
+    return _controllers[name]
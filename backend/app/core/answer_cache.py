@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import itertools
+import logging
+import time
+import numpy as np
+from ..config import settings
+from .metrics import ANSWER_CACHE
+
+logger = logging.getLogger(__name__)
+
+class AnswerCache:
+    """In-memory cache of answers, matched by cosine similarity of query embeddings.
+
+    Entries are tied to the index version they were generated against; a
+    lookup with a newer version drops the whole cache.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.threshold = threshold if threshold is not None else settings.ANSWER_CACHE_THRESHOLD
+        self.ttl = ttl if ttl is not None else settings.ANSWER_CACHE_TTL
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._ids = itertools.count()
+        self._version = None
+        # Stacked, normalized query vectors; rebuilt lazily after inserts/evictions
+        self._matrix = None
+        self._matrix_keys: List[int] = []
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    @staticmethod
+    def _scope(document_ids: Optional[List[str]]) -> Tuple[str, ...]:
+        return tuple(sorted(document_ids)) if document_ids else ()
+
+    def _sync_version(self, version: int) -> None:
+        if self._version != version:
+            if self._entries:
+                logger.info(f"Index version changed to {version}, dropping {len(self._entries)} cached answers")
+            self.clear()
+            self._version = version
+
+    def _expire(self) -> None:
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry["created"] < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def lookup(self, vector: Sequence[float], version: int,
+               document_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Return the closest cached entry above the similarity threshold, if any"""
+        self._sync_version(version)
+        self._expire()
+        if not self._entries:
+            self.misses += 1
+            ANSWER_CACHE.inc(result="miss")
+            return None
+
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key]["vector"] for key in self._matrix_keys])
+        scores = self._matrix @ self._normalize(vector)
+        scope = self._scope(document_ids)
+        # Walk candidates from most to least similar until one with the same scope is found
+        for position in np.argsort(-scores):
+            if scores[position] < self.threshold:
+                break
+            key = self._matrix_keys[position]
+            entry = self._entries[key]
+            if entry["scope"] == scope:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                ANSWER_CACHE.inc(result="hit")
+                return {**entry, "similarity": float(scores[position])}
+        self.misses += 1
+        ANSWER_CACHE.inc(result="miss")
+        return None
+
+    def store(self, vector: Sequence[float], version: int, answer: str, chunk_ids: List[str],
+              document_ids: Optional[List[str]] = None, sources: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Cache an answer generated against the given index version, with the sources it cites"""
+        self._sync_version(version)
+        self._entries[next(self._ids)] = {
+            "vector": self._normalize(vector),
+            "scope": self._scope(document_ids),
+            "answer": answer,
+            "chunk_ids": chunk_ids,
+            "sources": sources or [],
+            "created": time.monotonic()
+        }
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,200 @@
+from typing import AbstractSet, Any, Dict, Iterator, List, NamedTuple, Optional
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+import hashlib
+import re
+from ..config import settings
+
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[A-Z]\.|(?:chapter|section|part|appendix)\s+\w+\b)\s*\S", re.IGNORECASE)
+# Three or more cells separated by tabs, pipes or runs of spaces
+_TABLE_ROW = re.compile(r"^\s*\S.*?(?:\t|\s{2,}|\s\|\s)\S.*?(?:\t|\s{2,}|\s\|\s)\S")
+# Page numbers printed in headers and footers: "Page 3", "Page 3 of 12", "Manual Rev B 3 of 12"
+_PAGE_NUMBER = re.compile(r"\bpage\s+\d+\b|\b\d+\s+of\s+\d+$", re.IGNORECASE)
+_SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+class Block(NamedTuple):
+    """A heading, paragraph or table with its position in the extracted page text"""
+    kind: str
+    text: str
+    page: int
+    start: int
+    end: int
+
+def _is_heading(line: str) -> bool:
+    if len(line) > 80 or line[-1] in ".,;:" or not any(c.isalpha() for c in line):
+        return False
+    if _PAGE_NUMBER.search(line):
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return True
+    words = line.split()
+    if len(words) > 8:
+        return False
+    letters = [c for c in line if c.isalpha()]
+    if all(c.isupper() for c in letters) and len(letters) > 3:
+        return True
+    return all(word[0].isupper() or word.lower() in _SMALL_WORDS for word in words if word[0].isalpha())
+
+def _kind(line: str, running: AbstractSet[str] = frozenset()) -> str:
+    if _TABLE_ROW.match(line) or line.count("|") >= 2:
+        return "table"
+    stripped = line.strip()
+    if stripped not in running and _is_heading(stripped):
+        return "heading"
+    return "text"
+
+def page_blocks(text: str, page: int, running: AbstractSet[str] = frozenset()) -> Iterator[Block]:
+    """Group the lines of one page into heading, paragraph and table blocks.
+
+    Lines in running are headers or footers repeated across pages and are
+    never taken for headings.
+    """
+    kind, start, end = None, 0, 0
+    position = 0
+    for line in text.splitlines(keepends=True):
+        line_start, position = position, position + len(line)
+        stripped = line.strip()
+        if not stripped:
+            # A blank line ends any block
+            if kind is not None:
+                yield Block(kind, text[start:end], page, start, end)
+                kind = None
+            continue
+        line_kind = _kind(line, running)
+        # Headings stand alone; consecutive text or table lines are merged
+        if kind is not None and (line_kind != kind or line_kind == "heading"):
+            yield Block(kind, text[start:end], page, start, end)
+            kind = None
+        if kind is None:
+            kind, start = line_kind, line_start + len(line) - len(line.lstrip())
+        end = line_start + len(line.rstrip())
+    if kind is not None:
+        yield Block(kind, text[start:end], page, start, end)
+
+class StructuredChunker:
+    """Page-aware chunker that cuts at headings and keeps paragraphs and tables whole.
+
+    Pages are fed one at a time, so a document is chunked without joining its
+    text. Each chunk records the page span and the character offsets of its
+    first and last block in the extracted page text, the heading it falls
+    under, and a hash of its content.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        # Fallback for single paragraphs that are larger than a chunk
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap, add_start_index=True
+        )
+        self._blocks: List[Block] = []
+        self._size = 0
+        # False while the only blocks held are overlap carried from the previous chunk
+        self._fresh = False
+        self._section: Optional[str] = None
+        self._chunk_section: Optional[str] = None
+        self._metadata: Dict[str, Any] = {}
+        self._index = 0
+        # Heading-like line -> number of pages it appeared on, to spot running headers
+        self._heading_pages: Dict[str, int] = {}
+        self._pages = 0
+
+    def _split_block(self, block: Block) -> Iterator[Block]:
+        """Cut an oversized block into pieces, tables by rows and text by the recursive splitter"""
+        if block.kind == "table":
+            rows, start = [], block.start
+            offset = block.start
+            for row in block.text.split("\n"):
+                if rows and sum(len(r) + 1 for r in rows) + len(row) > self.chunk_size:
+                    yield Block("table", "\n".join(rows), block.page, start, offset - 1)
+                    rows, start = [], offset
+                rows.append(row)
+                offset += len(row) + 1
+            yield Block("table", "\n".join(rows), block.page, start, block.end)
+            return
+        for piece in self.splitter.create_documents([block.text]):
+            start = block.start + piece.metadata["start_index"]
+            yield Block(block.kind, piece.page_content, block.page, start, start + len(piece.page_content))
+
+    def _emit(self) -> Optional[Document]:
+        if not self._blocks:
+            return None
+        blocks = self._blocks
+        text = "\n\n".join(block.text for block in blocks)
+        metadata = {
+            **self._metadata,
+            "page": blocks[0].page,
+            "page_start": blocks[0].page,
+            "page_end": blocks[-1].page,
+            "start_offset": blocks[0].start,
+            "end_offset": blocks[-1].end,
+            "section": self._chunk_section,
+            "chunk_index": self._index,
+            "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest()
+        }
+        self._index += 1
+        # Carry the trailing block into the next chunk when it fits in the overlap
+        last = blocks[-1]
+        if 0 < len(last.text) <= self.chunk_overlap and last.kind != "heading" and len(blocks) > 1:
+            self._blocks, self._size = [last], len(last.text) + 2
+        else:
+            self._blocks, self._size = [], 0
+        self._fresh = False
+        self._chunk_section = self._section
+        return Document(page_content=text, metadata=metadata)
+
+    def _add(self, block: Block) -> Iterator[Document]:
+        if block.kind == "heading":
+            # Start a new chunk at each heading unless the current one is still small
+            if self._fresh and self._size >= self.chunk_size // 4:
+                chunk = self._emit()
+                if chunk:
+                    yield chunk
+            if not self._fresh:
+                # Overlap from the previous section does not belong under the new heading
+                self._blocks, self._size = [], 0
+            self._section = block.text
+            # Of several headings in a row, the last one is the body's section; this also
+            # skips a running header on the first page, before it is known to repeat
+            if all(held.kind == "heading" for held in self._blocks):
+                self._chunk_section = block.text
+        pieces = [block] if len(block.text) <= self.chunk_size else list(self._split_block(block))
+        for piece in pieces:
+            # A heading is never left on its own; it may push its first block slightly over size
+            headings_only = all(held.kind == "heading" for held in self._blocks)
+            if self._blocks and not headings_only and self._size + len(piece.text) + 2 > self.chunk_size:
+                chunk = self._emit()
+                if chunk:
+                    yield chunk
+            self._blocks.append(piece)
+            self._size += len(piece.text) + 2
+            self._fresh = True
+
+    def _running_headers(self, text: str) -> AbstractSet[str]:
+        """Heading-like lines of this page that also appear on most of the pages before it"""
+        self._pages += 1
+        running = set()
+        for line in {line.strip() for line in text.splitlines() if line.strip()}:
+            if not _is_heading(line):
+                continue
+            count = self._heading_pages.get(line, 0) + 1
+            self._heading_pages[line] = count
+            if count > 1 and count * 2 > self._pages:
+                running.add(line)
+        return running
+
+    def feed(self, page: Document) -> List[Document]:
+        """Add one extracted page and return the chunks completed so far"""
+        self._metadata = {key: value for key, value in page.metadata.items() if key != "page"}
+        running = self._running_headers(page.page_content)
+        chunks = []
+        for block in page_blocks(page.page_content, page.metadata.get("page", 0), running):
+            chunks.extend(self._add(block))
+        return chunks
+
+    def finish(self) -> List[Document]:
+        """Return the last, partially filled chunk, unless it holds nothing but headings"""
+        has_body = any(block.kind != "heading" for block in self._blocks)
+        chunk = self._emit() if self._fresh and has_body else None
+        self._blocks, self._size = [], 0
+        return [chunk] if chunk else []
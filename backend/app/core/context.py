@@ -0,0 +1,90 @@
+from typing import List, Optional
+from langchain.schema import Document
+import logging
+import math
+import re
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Preferred places to cut a chunk that does not fit, best first
+_BREAKS = (re.compile(r"\n\s*\n"), re.compile(r"(?<=[.!?])\s+"), re.compile(r"\n"), re.compile(r"\s+"))
+
+class ContextBuilder:
+    """Select and trim retrieved chunks so the prompt stays within a token budget.
+
+    Chunks are taken in relevance order until the budget is spent; the one
+    that overflows is cut at a paragraph or sentence boundary if enough
+    budget is left to make it useful. The selection is then laid out in
+    document order, so follow-up questions about the same passages produce
+    the same context text and Ollama can reuse more of the evaluated prompt.
+    """
+
+    def __init__(self, budget: Optional[int] = None, chars_per_token: Optional[float] = None,
+                 min_chunk_tokens: Optional[int] = None):
+        self.budget = budget or settings.CONTEXT_TOKEN_BUDGET
+        self.chars_per_token = chars_per_token or settings.CHARS_PER_TOKEN
+        self.min_chunk_tokens = min_chunk_tokens or settings.CONTEXT_MIN_CHUNK_TOKENS
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate tokens from characters; close enough for budgeting without a tokenizer"""
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def _trim(self, text: str, tokens: int) -> str:
+        limit = int(tokens * self.chars_per_token)
+        head = text[:limit]
+        for pattern in _BREAKS:
+            cuts = [match.start() for match in pattern.finditer(head)]
+            # Only accept a boundary that keeps most of the allowed text
+            if cuts and cuts[-1] >= limit // 2:
+                return head[:cuts[-1]].rstrip()
+        return head.rstrip()
+
+    @staticmethod
+    def _label(doc: Document) -> str:
+        source = doc.metadata.get("source") or "document"
+        first = doc.metadata.get("page_start", doc.metadata.get("page"))
+        last = doc.metadata.get("page_end", first)
+        if first is None:
+            return f"[{source}]"
+        return f"[{source}, pages {first}-{last}]" if last != first else f"[{source}, page {first}]"
+
+    @staticmethod
+    def _position(doc: Document):
+        metadata = doc.metadata
+        return (
+            str(metadata.get("doc_id") or metadata.get("source") or ""),
+            metadata.get("page_start", metadata.get("page")) or 0,
+            metadata.get("start_offset") or 0
+        )
+
+    def select(self, docs: List[Document]) -> List[Document]:
+        """Return the chunks (possibly trimmed copies) that fit in the budget, in document order"""
+        selected = []
+        remaining = self.budget
+        seen = set()
+        for doc in docs:
+            text = doc.page_content.strip()
+            if not text or text in seen:
+                continue
+            # The label and separator count against the budget too
+            overhead = self.count_tokens(self._label(doc)) + 1
+            tokens = self.count_tokens(text) + overhead
+            if tokens > remaining:
+                available = remaining - overhead
+                if available < self.min_chunk_tokens:
+                    break
+                text = self._trim(text, available)
+                tokens = self.count_tokens(text) + overhead
+            seen.add(doc.page_content.strip())
+            selected.append(Document(page_content=text, metadata=doc.metadata))
+            remaining -= tokens
+            if remaining < self.min_chunk_tokens:
+                break
+        if len(selected) < len(docs):
+            logger.info(f"Context budget of {self.budget} tokens fits {len(selected)} of {len(docs)} chunks")
+        return sorted(selected, key=self._position)
+
+    def build(self, docs: List[Document]) -> str:
+        """Render the selected chunks as labelled passages"""
+        return "\n\n".join(f"{self._label(doc)}\n{doc.page_content}" for doc in self.select(docs))
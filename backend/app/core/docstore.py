@@ -0,0 +1,167 @@
+from collections.abc import Mapping
+from typing import BinaryIO, Dict, Iterator, List, Sequence, Union
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain.schema import Document
+import json
+import mmap
+import numpy as np
+import os
+
+# File names inside the index directory
+RECORDS_FILE = "docstore.jsonl"
+OFFSETS_FILE = "docstore_offsets.npy"
+IDS_FILE = "docstore_ids.npy"
+SORTED_IDS_FILE = "docstore_sorted_ids.npy"
+SORTED_POSITIONS_FILE = "docstore_sorted_positions.npy"
+
+def _encode(doc: Document) -> bytes:
+    return json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}).encode("utf-8") + b"\n"
+
+def _write_records(f: BinaryIO, docstore: Docstore, ids: List[str]) -> np.ndarray:
+    """Write one JSON line per ID and return the length of each"""
+    if isinstance(docstore, OverlayDocstore):
+        positions = docstore.base_positions(ids)
+    else:
+        positions = np.full(len(ids), -1, dtype=np.int64)
+    lengths = np.zeros(len(ids), dtype=np.int64)
+    if not ids:
+        return lengths
+    # Split into runs of records that sit back to back in the base file; those are
+    # copied as one block without parsing, and every other record is encoded alone
+    breaks = np.flatnonzero((positions[1:] != positions[:-1] + 1) | (positions[:-1] < 0)) + 1
+    for start, end in zip(np.concatenate([[0], breaks]), np.concatenate([breaks, [len(ids)]])):
+        if positions[start] >= 0:
+            lengths[start:end] = docstore.base.copy_records(f, int(positions[start]), int(positions[end - 1]) + 1)
+        else:
+            record = _encode(docstore.search(ids[start]))
+            f.write(record)
+            lengths[start] = len(record)
+    return lengths
+
+def write_docstore(path: str, docstore: Docstore, index_to_docstore_id: Mapping) -> None:
+    """Write the documents in FAISS position order as JSON lines plus offset and ID tables"""
+    count = len(index_to_docstore_id)
+    ids = [index_to_docstore_id[position] for position in range(count)]
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    with open(os.path.join(path, RECORDS_FILE), "wb") as f:
+        np.cumsum(_write_records(f, docstore, ids), out=offsets[1:])
+    id_array = np.array([id_.encode("utf-8") for id_ in ids], dtype=f"S{max((len(id_) for id_ in ids), default=1)}")
+    order = np.argsort(id_array, kind="stable")
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+    np.save(os.path.join(path, IDS_FILE), id_array)
+    np.save(os.path.join(path, SORTED_IDS_FILE), id_array[order])
+    np.save(os.path.join(path, SORTED_POSITIONS_FILE), order.astype(np.int64))
+
+def has_docstore(path: str) -> bool:
+    return os.path.exists(os.path.join(path, RECORDS_FILE))
+
+class PositionIds(Mapping):
+    """Read-only FAISS position -> docstore ID mapping backed by a memory-mapped array"""
+
+    def __init__(self, ids: np.ndarray):
+        self._ids = ids
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self._ids):
+            raise KeyError(position)
+        return self._ids[position].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self._ids)))
+
+class MmapDocstore(Docstore):
+    """Read-only docstore that parses a document only when it is looked up.
+
+    Opening it maps the files without reading them, so the cost does not
+    grow with the corpus. Writers wrap it in an OverlayDocstore.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r", allow_pickle=False)
+        self._ids = np.load(os.path.join(path, IDS_FILE), mmap_mode="r", allow_pickle=False)
+        self._sorted_ids = np.load(os.path.join(path, SORTED_IDS_FILE), mmap_mode="r", allow_pickle=False)
+        self._sorted_positions = np.load(os.path.join(path, SORTED_POSITIONS_FILE), mmap_mode="r",
+                                         allow_pickle=False)
+        self._file = open(os.path.join(path, RECORDS_FILE), "rb")
+        # mmap cannot map an empty file
+        self._records = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def index_to_docstore_id(self) -> PositionIds:
+        return PositionIds(self._ids)
+
+    def _position(self, id_: str) -> int:
+        key = id_.encode("utf-8")
+        found = int(np.searchsorted(self._sorted_ids, key))
+        if found < len(self._sorted_ids) and self._sorted_ids[found] == key:
+            return int(self._sorted_positions[found])
+        return -1
+
+    def positions(self, ids: Sequence[str]) -> np.ndarray:
+        """FAISS positions of several IDs in one binary search, -1 where an ID is unknown"""
+        if not len(self._sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        keys = np.array([id_.encode("utf-8") for id_ in ids], dtype=self._sorted_ids.dtype)
+        found = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self._sorted_ids) - 1)
+        matched = self._sorted_ids[found] == keys
+        return np.where(matched, self._sorted_positions[found], -1).astype(np.int64)
+
+    def get(self, position: int) -> Document:
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        record = json.loads(self._records[start:end])
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def search(self, search: str) -> Union[str, Document]:
+        position = self._position(search)
+        if position < 0:
+            return f"ID {search} not found."
+        return self.get(position)
+
+    def copy_records(self, f: BinaryIO, start: int, end: int) -> np.ndarray:
+        """Write the raw records at positions start to end - 1 and return their lengths"""
+        f.write(self._records[int(self._offsets[start]):int(self._offsets[end])])
+        return np.diff(self._offsets[start:end + 1])
+
+class OverlayDocstore(Docstore, AddableMixin):
+    """Writable view of an MmapDocstore.
+
+    Added documents are kept in memory and deletions are recorded; every
+    other lookup goes to the base. When saved, records still held by the
+    base are copied byte for byte instead of being parsed and re-encoded.
+    """
+
+    def __init__(self, base: MmapDocstore):
+        self.base = base
+        self._added: Dict[str, Document] = {}
+        self._deleted = set()
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        self._added.update(texts)
+        self._deleted.difference_update(texts)
+
+    def delete(self, ids: List) -> None:
+        for id_ in ids:
+            self._added.pop(id_, None)
+            self._deleted.add(id_)
+
+    def search(self, search: str) -> Union[str, Document]:
+        if search in self._added:
+            return self._added[search]
+        if search in self._deleted:
+            return f"ID {search} not found."
+        return self.base.search(search)
+
+    def base_positions(self, ids: Sequence[str]) -> np.ndarray:
+        """Positions of the IDs whose record is still the base's, -1 for the rest"""
+        positions = self.base.positions(ids)
+        if self._added or self._deleted:
+            for i, id_ in enumerate(ids):
+                if id_ in self._added or id_ in self._deleted:
+                    positions[i] = -1
+        return positions
@@ -0,0 +1,102 @@
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+import asyncio
+import httpx
+import logging
+from ..config import settings
+from .admission import get_admission_controller
+
+logger = logging.getLogger(__name__)
+
+class OllamaBatchEmbeddings(Embeddings):
+    """Ollama embeddings client that sends batched requests over pooled connections"""
+
+    # Same instruction prefixes as langchain's OllamaEmbeddings
+    embed_instruction = "passage: "
+    query_instruction = "query: "
+
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None,
+                 batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.model = model or settings.EMBEDDING_MODEL
+        self.base_url = base_url or settings.OLLAMA_BASE_URL
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.concurrency = concurrency or settings.EMBEDDING_CONCURRENCY
+        self._client = None
+        self._async_client = None
+        self._semaphore = None
+        # Query embeddings sit on the request path and go through admission control; document
+        # batches are already paced by the ingestion queue and only share the semaphore
+        self.admission = get_admission_controller("embedding")
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(base_url=self.base_url, timeout=settings.OLLAMA_TIMEOUT,
+                                        limits=self._limits())
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool and semaphore bind to the running event loop
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=settings.OLLAMA_TIMEOUT,
+                                                   limits=self._limits())
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._async_client
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _parse(self, response: httpx.Response, expected: int) -> List[List[float]]:
+        response.raise_for_status()
+        embeddings = response.json().get("embeddings")
+        if not embeddings or len(embeddings) != expected:
+            raise ValueError(f"Ollama returned {len(embeddings or [])} embeddings for {expected} inputs")
+        return embeddings
+
+    def _embed(self, inputs: List[str]) -> List[List[float]]:
+        response = self.client.post("/api/embed", json={"model": self.model, "input": inputs})
+        return self._parse(response, len(inputs))
+
+    async def _aembed(self, inputs: List[str]) -> List[List[float]]:
+        client = self.async_client
+        async with self._semaphore:
+            response = await client.post("/api/embed", json={"model": self.model, "input": inputs})
+        return self._parse(response, len(inputs))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for batch in self._batches([f"{self.embed_instruction}{text}" for text in texts]):
+            vectors.extend(self._embed(batch))
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = self._batches([f"{self.embed_instruction}{text}" for text in texts])
+        results = await asyncio.gather(*(self._aembed(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([f"{self.query_instruction}{text}"])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async with self.admission.slot():
+            return (await self._aembed([f"{self.query_instruction}{text}"]))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in as few requests as possible"""
+        batches = self._batches([f"{self.query_instruction}{text}" for text in texts])
+        async with self.admission.slot():
+            results = await asyncio.gather(*(self._aembed(batch) for batch in batches))
+        return [vector for batch in results for vector in batch]
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
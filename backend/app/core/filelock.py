@@ -0,0 +1,57 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import asyncio
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: locking is a no-op, so only a single worker process is safe
+    fcntl = None
+
+class FileLock:
+    """Advisory lock shared by every process that opens the same path.
+
+    Shared holders may overlap and an exclusive holder waits for all of
+    them. Each hold opens its own descriptor, so holders in the same
+    process exclude each other the same way.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def acquire(self, exclusive: bool = True) -> int:
+        """Block until the lock is granted and return the descriptor to release"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            except BaseException:
+                os.close(fd)
+                raise
+        return fd
+
+    @staticmethod
+    def release(fd: int) -> None:
+        # Closing the descriptor drops the lock
+        os.close(fd)
+
+    def _release_when_granted(self, acquiring: asyncio.Future) -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.release(acquiring.result())
+
+    @asynccontextmanager
+    async def hold(self, exclusive: bool = True) -> AsyncIterator[None]:
+        """Wait for the lock in a worker thread so the event loop keeps serving"""
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.acquire, exclusive))
+        try:
+            fd = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted, so give the lock back once it is granted
+            acquiring.add_done_callback(self._release_when_granted)
+            raise
+        try:
+            yield
+        finally:
+            self.release(fd)
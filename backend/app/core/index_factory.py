@@ -0,0 +1,154 @@
+from typing import Any, Dict
+import faiss
+import logging
+import math
+import numpy as np
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "ivfpq")
+
+def _nlist(count: int) -> int:
+    if settings.FAISS_NLIST > 0:
+        return settings.FAISS_NLIST
+    # Rule of thumb: about 4 * sqrt(n) lists for corpora of up to a few million vectors
+    return max(1, int(4 * math.sqrt(count)))
+
+def _pq_m(dims: int) -> int:
+    # The number of sub-quantizers must divide the vector dimension
+    m = min(settings.FAISS_PQ_M, dims)
+    while dims % m:
+        m -= 1
+    return m
+
+def index_params(index_type: str, dims: int, count: int) -> Dict[str, Any]:
+    """Return the build parameters for an index type and corpus size"""
+    if index_type == "flat":
+        return {}
+    if index_type == "ivf":
+        return {"nlist": _nlist(count)}
+    if index_type == "hnsw":
+        return {"M": settings.FAISS_HNSW_M, "efConstruction": settings.FAISS_EF_CONSTRUCTION}
+    if index_type == "pq":
+        return {"m": _pq_m(dims), "nbits": settings.FAISS_PQ_NBITS}
+    if index_type == "ivfpq":
+        return {"nlist": _nlist(count), "m": _pq_m(dims), "nbits": settings.FAISS_PQ_NBITS}
+    raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+def min_training_vectors(index_type: str, params: Dict[str, Any]) -> int:
+    """Number of vectors needed before an index of this type can be trained"""
+    # k-means needs at least one point per centroid; faiss asks for ~39 per centroid
+    required = 0
+    if "nlist" in params:
+        required = max(required, params["nlist"] * 39)
+    if "nbits" in params:
+        required = max(required, (2 ** params["nbits"]) * 39)
+    return required
+
+def _factory_string(index_type: str, params: Dict[str, Any]) -> str:
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "ivf":
+        return f"IVF{params['nlist']},Flat"
+    if index_type == "hnsw":
+        return f"HNSW{params['M']}"
+    if index_type == "pq":
+        return f"PQ{params['m']}x{params['nbits']}"
+    return f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}"
+
+def build_index(vectors: np.ndarray, index_type: str) -> faiss.Index:
+    """Build and fill an L2 index of the given type, training it on the vectors if needed"""
+    count, dims = vectors.shape
+    params = index_params(index_type, dims, count)
+    index = faiss.index_factory(dims, _factory_string(index_type, params), faiss.METRIC_L2)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = params["efConstruction"]
+    if not index.is_trained:
+        logger.info(f"Training {index_type} index on {count} vectors")
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index)
+    return index
+
+def index_type_of(index: faiss.Index) -> str:
+    """Return which of INDEX_TYPES an index was built as"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return "flat"
+
+def apply_search_params(index: faiss.Index) -> None:
+    """Set the query-time knobs (nprobe, efSearch) from settings"""
+    index_type = index_type_of(index)
+    parameters = faiss.ParameterSpace()
+    if index_type in ("ivf", "ivfpq"):
+        parameters.set_index_parameter(index, "nprobe", settings.FAISS_NPROBE)
+    elif index_type == "hnsw":
+        parameters.set_index_parameter(index, "efSearch", settings.FAISS_EF_SEARCH)
+
+def supports_removal(index: faiss.Index) -> bool:
+    # Flat code arrays compact on remove_ids, keeping positions contiguous. IVF lists keep
+    # the old ids (leaving gaps) and HNSW graphs cannot drop nodes, so those are rebuilt.
+    return index_type_of(index) in ("flat", "pq")
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Return every stored vector in position order (approximate for PQ indexes)"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def enable_reconstruct(index: faiss.Index) -> None:
+    """Build the position map IVF indexes need before single vectors can be reconstructed"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.no():
+        ivf.make_direct_map()
+
+def reconstruct_positions(index: faiss.Index, positions: np.ndarray) -> np.ndarray:
+    """Return the stored vectors at the given positions (approximate for PQ indexes)"""
+    return index.reconstruct_batch(np.ascontiguousarray(positions, dtype=np.int64))
+
+def rebuild_without(index: faiss.Index, keep: np.ndarray) -> faiss.Index:
+    """Return a copy of the index holding only the vectors at the given positions"""
+    vectors = reconstruct_all(index)[keep]
+    if faiss.try_extract_index_ivf(index) is None:
+        return build_index(vectors, index_type_of(index))
+    # Reuse the trained coarse quantizer (and PQ codebook) instead of retraining
+    rebuilt = faiss.clone_index(index)
+    rebuilt.reset()
+    rebuilt.add(vectors)
+    apply_search_params(rebuilt)
+    return rebuilt
+
+def built_params(index: faiss.Index) -> Dict[str, Any]:
+    """Read the build parameters back from an existing index"""
+    index_type = index_type_of(index)
+    params: Dict[str, Any] = {}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params["nlist"] = ivf.nlist
+    concrete = faiss.downcast_index(index)
+    if index_type in ("pq", "ivfpq"):
+        params["m"] = concrete.pq.M
+        params["nbits"] = concrete.pq.nbits
+    if index_type == "hnsw":
+        params["M"] = concrete.hnsw.nb_neighbors(1)
+        params["efConstruction"] = concrete.hnsw.efConstruction
+    return params
+
+def describe(index: faiss.Index) -> Dict[str, Any]:
+    """Metadata persisted next to the index so the build choice survives restarts"""
+    return {
+        "index_type": index_type_of(index),
+        "configured_type": settings.FAISS_INDEX_TYPE,
+        "dims": index.d,
+        "count": index.ntotal,
+        "params": built_params(index)
+    }
@@ -0,0 +1,312 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from langchain.schema import Document
+import json
+import math
+import numpy as np
+import os
+import re
+from ..config import settings
+
+# File names inside the index directory
+LEXICAL_META_FILE = "lexical_meta.json"
+LEXICAL_FILES = {
+    "terms": "lexical_terms.npy",
+    "term_offsets": "lexical_term_offsets.npy",
+    "posting_chunks": "lexical_posting_chunks.npy",
+    "posting_counts": "lexical_posting_counts.npy",
+    "chunk_ids": "lexical_chunk_ids.npy",
+    "chunk_lengths": "lexical_chunk_lengths.npy",
+    "chunk_docs": "lexical_chunk_docs.npy",
+    "doc_ids": "lexical_doc_ids.npy"
+}
+
+# Identifiers such as "PN-0042-07", "M8x1.25" or "v2_rev3" are kept whole, and their
+# parts are indexed as well so partial matches still score
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART.findall(token))
+    return tokens
+
+def is_identifier(token: str) -> bool:
+    """Tokens mixing letters and digits (or numbers with separators) name one specific thing"""
+    return len(token) >= 3 and any(c.isdigit() for c in token) and (
+        any(c.isalpha() for c in token) or not token.isalnum()
+    )
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists by summing 1 / (k + rank) per list, best first"""
+    k = k or settings.RRF_K
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class BM25Index:
+    """Inverted index over chunk text, built in memory as chunks are tokenized.
+
+    Chunks are keyed by their chunk_id (the FAISS docstore ID) and remember
+    their doc_id. Searches run on the array layout made by
+    MmapBM25Index.from_index.
+    """
+
+    def __init__(self):
+        self.k1 = settings.BM25_K1
+        self.b = settings.BM25_B
+        # term -> {chunk_id: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # chunk_id -> [token count, doc_id]
+        self.chunks: Dict[str, list] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def add(self, documents: Iterable[Document]) -> None:
+        """Index chunks that carry chunk_id (and doc_id) metadata"""
+        for document in documents:
+            chunk_id = document.metadata["chunk_id"]
+            tokens = tokenize(document.page_content)
+            self.chunks[chunk_id] = [len(tokens), document.metadata.get("doc_id")]
+            self.total_length += len(tokens)
+            for term, count in Counter(tokens).items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+
+def _bytes_array(values: Sequence[str]) -> np.ndarray:
+    encoded = [value.encode("utf-8") for value in values]
+    return np.array(encoded, dtype=f"S{max((len(value) for value in encoded), default=1)}")
+
+def _lookup(table: np.ndarray, values: Sequence[str]) -> np.ndarray:
+    """Rows of values in a sorted bytes table, -1 where a value is absent"""
+    rows = np.full(len(values), -1, dtype=np.int64)
+    if not len(table) or not len(values):
+        return rows
+    encoded = [value.encode("utf-8") for value in values]
+    # Values longer than the table's width would be truncated into false matches
+    fits = np.array([len(value) <= table.itemsize for value in encoded])
+    keys = np.array(encoded, dtype=table.dtype)
+    found = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+    matched = fits & (table[found] == keys)
+    rows[matched] = found[matched]
+    return rows
+
+def has_lexical(path: str) -> bool:
+    return os.path.exists(os.path.join(path, LEXICAL_META_FILE))
+
+class MmapBM25Index:
+    """BM25 index stored as sorted numpy arrays, memory-mapped when loaded from disk.
+
+    Terms, chunk IDs and doc IDs are sorted tables. Each term's postings are
+    a slice of posting_chunks/posting_counts given by term_offsets, ordered by
+    chunk row. Loading maps the files without reading them, and a search
+    touches only the postings of its query terms. The index is immutable:
+    merge and without return a new one.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], k1: float, b: float):
+        self.terms = arrays["terms"]
+        self.term_offsets = arrays["term_offsets"]
+        self.posting_chunks = arrays["posting_chunks"]
+        self.posting_counts = arrays["posting_counts"]
+        self.chunk_ids = arrays["chunk_ids"]
+        self.chunk_lengths = arrays["chunk_lengths"]
+        self.chunk_docs = arrays["chunk_docs"]
+        self.doc_ids = arrays["doc_ids"]
+        self.k1 = k1
+        self.b = b
+        self.total_length = int(self.chunk_lengths.sum())
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def _derive(self, arrays: Dict[str, np.ndarray]) -> "MmapBM25Index":
+        return MmapBM25Index(arrays, self.k1, self.b)
+
+    @staticmethod
+    def _postings_arrays(term_rows: np.ndarray, chunk_rows: np.ndarray, counts: np.ndarray,
+                         term_count: int, chunk_count: int) -> Dict[str, np.ndarray]:
+        # Sorting by (term, chunk) groups each term's postings into one slice. Inputs are
+        # one or two already sorted runs, which a stable sort on a single key merges in linear time
+        order = np.argsort(term_rows.astype(np.int64) * chunk_count + chunk_rows, kind="stable")
+        term_rows = term_rows[order]
+        return {
+            "term_offsets": np.searchsorted(term_rows, np.arange(term_count + 1)).astype(np.int64),
+            "posting_chunks": chunk_rows[order].astype(np.int32),
+            "posting_counts": counts[order].astype(np.int32)
+        }
+
+    @classmethod
+    def from_index(cls, index: BM25Index) -> "MmapBM25Index":
+        """Convert an in-memory BM25Index to the array layout"""
+        chunk_ids = sorted(index.chunks)
+        chunk_rows = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+        doc_ids = sorted({doc_id or "" for _, doc_id in index.chunks.values()})
+        doc_rows = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+        terms = sorted(index.postings)
+        term_rows, posting_chunks, counts = [], [], []
+        for row, term in enumerate(terms):
+            posting = index.postings[term]
+            term_rows.extend([row] * len(posting))
+            posting_chunks.extend(chunk_rows[chunk_id] for chunk_id in posting)
+            counts.extend(posting.values())
+        return cls({
+            "terms": _bytes_array(terms),
+            "chunk_ids": _bytes_array(chunk_ids),
+            "chunk_lengths": np.array([index.chunks[chunk_id][0] for chunk_id in chunk_ids], dtype=np.int32),
+            "chunk_docs": np.array([doc_rows[index.chunks[chunk_id][1] or ""] for chunk_id in chunk_ids],
+                                   dtype=np.int32),
+            "doc_ids": _bytes_array(doc_ids),
+            **cls._postings_arrays(np.array(term_rows, dtype=np.int64), np.array(posting_chunks, dtype=np.int64),
+                                   np.array(counts, dtype=np.int64), len(terms), len(chunk_ids))
+        }, index.k1, index.b)
+
+    @classmethod
+    def load(cls, path: str) -> "MmapBM25Index":
+        with open(os.path.join(path, LEXICAL_META_FILE), "r") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, filename), mmap_mode="r", allow_pickle=False)
+            for name, filename in LEXICAL_FILES.items()
+        }
+        return cls(arrays, meta["k1"], meta["b"])
+
+    def save(self, path: str) -> None:
+        for name, filename in LEXICAL_FILES.items():
+            np.save(os.path.join(path, filename), getattr(self, name))
+        with open(os.path.join(path, LEXICAL_META_FILE), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b}, f)
+
+    def merge(self, other: "MmapBM25Index") -> "MmapBM25Index":
+        """Return an index holding the chunks of both (built over different chunks)"""
+        chunk_ids = np.concatenate([self.chunk_ids, other.chunk_ids])
+        order = np.argsort(chunk_ids, kind="stable")
+        chunk_rows = np.empty(len(order), dtype=np.int64)
+        chunk_rows[order] = np.arange(len(order))
+        doc_ids = np.union1d(self.doc_ids, other.doc_ids)
+        chunk_docs = np.concatenate([
+            np.searchsorted(doc_ids, self.doc_ids)[self.chunk_docs],
+            np.searchsorted(doc_ids, other.doc_ids)[other.chunk_docs]
+        ])
+        terms = np.union1d(self.terms, other.terms)
+        term_rows = np.concatenate([
+            np.repeat(np.searchsorted(terms, self.terms), np.diff(self.term_offsets)),
+            np.repeat(np.searchsorted(terms, other.terms), np.diff(other.term_offsets))
+        ])
+        posting_chunks = np.concatenate([
+            chunk_rows[self.posting_chunks],
+            chunk_rows[len(self) + np.asarray(other.posting_chunks, dtype=np.int64)]
+        ])
+        counts = np.concatenate([self.posting_counts, other.posting_counts])
+        return self._derive({
+            "terms": terms,
+            "chunk_ids": chunk_ids[order],
+            "chunk_lengths": np.concatenate([self.chunk_lengths, other.chunk_lengths])[order],
+            "chunk_docs": chunk_docs[order].astype(np.int32),
+            "doc_ids": doc_ids,
+            **self._postings_arrays(term_rows, posting_chunks, counts, len(terms), len(order))
+        })
+
+    def without(self, chunk_ids: Iterable[str]) -> "MmapBM25Index":
+        """Return an index without the given chunks"""
+        rows = _lookup(self.chunk_ids, list(chunk_ids))
+        keep = np.ones(len(self), dtype=bool)
+        keep[rows[rows >= 0]] = False
+        new_rows = np.cumsum(keep) - 1
+        kept_postings = keep[self.posting_chunks]
+        term_rows = np.repeat(np.arange(len(self.terms)), np.diff(self.term_offsets))[kept_postings]
+        kept_terms = np.bincount(term_rows, minlength=len(self.terms)) > 0
+        term_rows = (np.cumsum(kept_terms) - 1)[term_rows]
+        used_docs = np.unique(self.chunk_docs[keep])
+        return self._derive({
+            "terms": self.terms[kept_terms],
+            "chunk_ids": self.chunk_ids[keep],
+            "chunk_lengths": self.chunk_lengths[keep],
+            "chunk_docs": np.searchsorted(used_docs, self.chunk_docs[keep]).astype(np.int32),
+            "doc_ids": self.doc_ids[used_docs],
+            **self._postings_arrays(term_rows, new_rows[self.posting_chunks[kept_postings]],
+                                    self.posting_counts[kept_postings], int(kept_terms.sum()), int(keep.sum()))
+        })
+
+    def _postings(self, term: str) -> slice:
+        row = _lookup(self.terms, [term])[0]
+        if row < 0:
+            return slice(0, 0)
+        return slice(int(self.term_offsets[row]), int(self.term_offsets[row + 1]))
+
+    def idf(self, term: str) -> float:
+        postings = self._postings(term)
+        df = postings.stop - postings.start
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def chunk_ids_of(self, doc_id: str) -> List[str]:
+        row = _lookup(self.doc_ids, [doc_id])[0]
+        if row < 0:
+            return []
+        return [chunk_id.decode("utf-8") for chunk_id in self.chunk_ids[self.chunk_docs == row]]
+
+    def in_documents(self, chunk_ids: Sequence[str], document_ids: Sequence[str]) -> np.ndarray:
+        """Mask of the chunks that belong to one of the documents"""
+        rows = _lookup(self.chunk_ids, chunk_ids)
+        allowed = _lookup(self.doc_ids, list(document_ids))
+        return (rows >= 0) & np.isin(self.chunk_docs[np.maximum(rows, 0)], allowed[allowed >= 0])
+
+    def search(self, query: str, k: int, document_ids: Optional[Sequence[str]] = None) -> List[Tuple[str, float]]:
+        """Return up to k (chunk_id, score) pairs, best first"""
+        if not len(self):
+            return []
+        average_length = self.total_length / len(self) or 1.0
+        scores = np.zeros(len(self), dtype=np.float64)
+        for term in set(tokenize(query)):
+            postings = self._postings(term)
+            if postings.stop == postings.start:
+                continue
+            chunks = self.posting_chunks[postings]
+            tf = self.posting_counts[postings].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[chunks] / average_length)
+            # A chunk appears once per term, so the indexed add does not drop repeats
+            scores[chunks] += self.idf(term) * tf * (self.k1 + 1) / (tf + norm)
+        matched = np.flatnonzero(scores)
+        if document_ids:
+            allowed = _lookup(self.doc_ids, list(document_ids))
+            matched = matched[np.isin(self.chunk_docs[matched], allowed[allowed >= 0])]
+        if len(matched) > k:
+            # Keep every chunk tied with the k-th score, so ties are broken by chunk ID below
+            threshold = np.partition(scores[matched], len(matched) - k)[len(matched) - k]
+            matched = matched[scores[matched] >= threshold]
+        matched = matched[np.lexsort((matched, -scores[matched]))][:k]
+        return [(self.chunk_ids[row].decode("utf-8"), float(scores[row])) for row in matched]
+
+    def term_overlap(self, queries: Sequence[str], chunk_ids: Sequence[str]) -> List[float]:
+        """Share of the query terms' IDF weight found in each chunk, from 0 to 1"""
+        weights = {term: self.idf(term) for query in queries for term in tokenize(query)}
+        total = sum(weights.values())
+        if not total:
+            return [0.0] * len(chunk_ids)
+        rows = _lookup(self.chunk_ids, chunk_ids)
+        overlap = np.zeros(len(chunk_ids), dtype=np.float64)
+        for term, weight in weights.items():
+            postings = self._postings(term)
+            if postings.stop > postings.start:
+                overlap += weight * np.isin(rows, self.posting_chunks[postings])
+        return (overlap / total).tolist()
+
+    def identifiers_matched(self, query: str, chunk_id: str) -> bool:
+        """True if the query names at least one identifier and the chunk contains all of them"""
+        identifiers = {token for token in tokenize(query) if is_identifier(token)}
+        row = _lookup(self.chunk_ids, [chunk_id])[0]
+        if not identifiers or row < 0:
+            return False
+        for token in identifiers:
+            chunks = self.posting_chunks[self._postings(token)]
+            found = int(np.searchsorted(chunks, row))
+            if found >= len(chunks) or chunks[found] != row:
+                return False
+        return True
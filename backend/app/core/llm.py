@@ -1,35 +1,146 @@
-from langchain.prompts import ChatPromptTemplate
-from langchain_community.llms import Ollama
-import logging
-from ..config import settings
-
-logger = logging.getLogger(__name__)
-
-class LLMHandler:
-    def __init__(self):
-        self.model = Ollama(model=settings.MODEL_NAME, base_url=settings.OLLAMA_BASE_URL)
-
-    def generate_query_prompt(self) -> str:
-        return """You are an AI assistant. Generate 2 different versions of the given user question 
-        to retrieve relevant documents from a vector database. Provide these alternative questions 
-        separated by newlines.
-        Original question: {question}"""
-
-    def generate_rag_prompt(self) -> ChatPromptTemplate:
-        template = """Answer the question based ONLY on the following context:
-        {context}
-        Question: {question}
-        """
-        return ChatPromptTemplate.from_template(template)
-
-    async def generate_response(self, question: str, context: str) -> str:
-        try:
-            formatted_prompt = self.generate_rag_prompt().format(
-                context=context or "No relevant context found.", 
-                question=question
-            )
-            response = await self.model.agenerate([formatted_prompt])
-            return response.generations[0][0].text
-        except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            raise
+from typing import AsyncIterator, List
+from langchain.prompts import ChatPromptTemplate
+from langchain_community.llms import Ollama
+import httpx
+import json
+import logging
+import re
+from ..config import settings
+from .admission import OverloadedError, get_admission_controller
+from .metrics import PROMPT_TOKENS, TOKENS
+
+logger = logging.getLogger(__name__)
+
+class LLMHandler:
+    def __init__(self):
+        self._model = None
+        self._client = None
+        self.admission = get_admission_controller("llm")
+
+    @property
+    def model(self) -> Ollama:
+        # Built on first use so creating the handler does not set up a client
+        if self._model is None:
+            self._model = Ollama(model=settings.MODEL_NAME, base_url=settings.OLLAMA_BASE_URL,
+                                 keep_alive=settings.OLLAMA_KEEP_ALIVE)
+        return self._model
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=settings.OLLAMA_BASE_URL, timeout=settings.OLLAMA_TIMEOUT)
+        return self._client
+
+    def generate_query_prompt(self) -> str:
+        return """You are an AI assistant. Generate 2 different versions of the given user question 
+        to retrieve relevant documents from a vector database. Provide these alternative questions 
+        separated by newlines.
+        Original question: {question}"""
+
+    def generate_rag_prompt(self) -> ChatPromptTemplate:
+        # Fixed instructions come first and the question last, so consecutive prompts share
+        # the longest possible prefix and Ollama can reuse its evaluation of it
+        template = """Answer the question based ONLY on the following context. Each passage is labelled with its source and page.
+
+Context:
+{context}
+
+Question: {question}
+"""
+        return ChatPromptTemplate.from_template(template)
+
+    def format_prompt(self, question: str, context: str) -> str:
+        return self.generate_rag_prompt().format(
+            context=context or "No relevant context found.", 
+            question=question
+        )
+
+    @staticmethod
+    def _count_tokens(info: dict, pieces: int = 0) -> None:
+        # Ollama reports exact counts on the final chunk; prompt_eval_count excludes a reused prefix
+        TOKENS.inc(info.get("eval_count") or pieces)
+        PROMPT_TOKENS.inc(info.get("prompt_eval_count") or 0)
+
+    async def generate_query_variants(self, question: str) -> List[str]:
+        """Ask the model for alternative phrasings of the question, one per line"""
+        try:
+            prompt = self.generate_query_prompt().format(question=question)
+            async with self.admission.slot():
+                response = await self.model.agenerate([prompt])
+            generation = response.generations[0][0]
+            self._count_tokens(generation.generation_info or {})
+            variants = []
+            for line in generation.text.splitlines():
+                # Drop list markers such as "1." or "-" that models like to add
+                line = re.sub(r"^\s*(?:[-*\u2022]|\d+[.)])\s*", "", line).strip().strip('"')
+                if line and line.lower() != question.lower().strip() and line not in variants:
+                    variants.append(line)
+            return variants[:settings.MULTI_QUERY_VARIANTS]
+        except OverloadedError:
+            # Refusals are counted by admission control rather than logged one by one
+            raise
+        except Exception as e:
+            logger.error(f"Error generating query variants: {e}")
+            raise
+
+    async def generate_response(self, question: str, context: str) -> str:
+        try:
+            formatted_prompt = self.format_prompt(question, context)
+            async with self.admission.slot():
+                response = await self.model.agenerate([formatted_prompt])
+            generation = response.generations[0][0]
+            self._count_tokens(generation.generation_info or {})
+            return generation.text
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            raise
+
+    async def load_model(self) -> None:
+        """Load the chat model into memory; Ollama only loads it when the prompt is empty"""
+        try:
+            response = await self.client.post("/api/generate", json={
+                "model": settings.MODEL_NAME,
+                "stream": False,
+                "keep_alive": settings.OLLAMA_KEEP_ALIVE
+            })
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Error loading model {settings.MODEL_NAME}: {e}")
+            raise
+
+    async def stream_response(self, question: str, context: str) -> AsyncIterator[str]:
+        """Yield response tokens as Ollama generates them.
+
+        Closing the generator closes the HTTP response, which makes Ollama
+        abort the generation.
+        """
+        payload = {
+            "model": settings.MODEL_NAME,
+            "prompt": self.format_prompt(question, context),
+            "stream": True,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE
+        }
+        pieces = 0
+        try:
+            # The slot is held until the last token, or until the consumer closes the stream
+            async with self.admission.slot(), self.client.stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if chunk.get("response"):
+                        pieces += 1
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        self._count_tokens(chunk, pieces)
+                        break
+        except OverloadedError:
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            raise
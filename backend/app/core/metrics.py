@@ -0,0 +1,140 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+import time
+
+# Upper bounds in seconds, from sub-millisecond index lookups to multi-minute uploads
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """Monotonic counter, one series per label combination"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Gauge:
+    """Value that goes up and down, one series per label combination"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and a few additions"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {repr(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram("offgrid_stage_duration_seconds", "Time spent in each stage of the chat and upload pipelines")
+PAGES = Counter("offgrid_pdf_pages_total", "PDF pages extracted")
+CHUNKS = Counter("offgrid_chunks_indexed_total", "Chunks added to the vector index")
+TOKENS = Counter("offgrid_llm_tokens_total", "Tokens generated by the language model")
+PROMPT_TOKENS = Counter("offgrid_llm_prompt_tokens_total", "Prompt tokens evaluated by the language model")
+EMBEDDING_CACHE = Counter("offgrid_embedding_cache_requests_total", "Embedding cache lookups by result")
+ANSWER_CACHE = Counter("offgrid_answer_cache_requests_total", "Semantic answer cache lookups by result")
+RETRIEVALS = Counter("offgrid_retrievals_total", "Chat retrievals by path (lexical, hybrid, multi_query, answer_cache)")
+ADMISSION_ACTIVE = Gauge("offgrid_admission_active", "Model calls in progress per admission pool")
+ADMISSION_QUEUE_DEPTH = Gauge("offgrid_admission_queue_depth", "Model calls waiting for a slot per admission pool")
+ADMISSION_WAIT_SECONDS = Histogram("offgrid_admission_wait_seconds", "Time admitted model calls waited for a slot")
+ADMISSION_REJECTED = Counter("offgrid_admission_rejected_total", "Model calls refused by admission control by reason")
+
+REGISTRY = (
+    STAGE_SECONDS, PAGES, CHUNKS, TOKENS, PROMPT_TOKENS, EMBEDDING_CACHE, ANSWER_CACHE, RETRIEVALS,
+    ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTED
+)
+
+@contextmanager
+def timed(pipeline: str, stage: str) -> Iterator[None]:
+    """Record the duration of a pipeline stage, including when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, pipeline=pipeline, stage=stage)
+
+def render_metrics() -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,43 +1,127 @@
-from typing import List
-from pathlib import Path
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
-from PyPDF2 import PdfReader
-import logging
-from io import BytesIO
-
-logger = logging.getLogger(__name__)
-
-class PDFProcessor:
-    def __init__(self, chunk_size: int = 7500, chunk_overlap: int = 100):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-
-    async def load_pdf(self, file: bytes) -> List[Document]:
-        try:
-            logger.info("Loading PDF content")
-            documents = []
-            # Create a file-like object from bytes
-            pdf_file = BytesIO(file)
-            reader = PdfReader(pdf_file)
-            
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    documents.append(Document(page_content=text))
-            return documents
-        except Exception as e:
-            logger.error(f"Error loading PDF: {e}")
-            raise
-
-    async def split_docs(self, documents: List[Document]) -> List[Document]:
-        try:
-            logger.info("Splitting documents into chunks")
-            return self.splitter.split_documents(documents)
-        except Exception as e:
-            logger.error(f"Error splitting documents: {e}")
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Tuple, Union
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from langchain.schema import Document
+from PyPDF2 import PdfReader
+import asyncio
+import logging
+import mmap
+import multiprocessing
+from ..config import settings
+from .chunker import StructuredChunker
+from .metrics import PAGES
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the process pool used for PDF text extraction, creating it on first use"""
+    global _executor
+    if _executor is None:
+        # spawn avoids forking a process that already runs the event loop and client threads
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def shutdown_executor(wait: bool = False) -> None:
+    """Stop the PDF extraction workers"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died, so the next call starts a fresh one"""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _count_pages(path: str) -> int:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return len(PdfReader(mapped).pages)
+
+def _extract_pages(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text from pages [start, end) in a worker process"""
+    # The file is memory-mapped so workers share the page cache instead of copying the PDF
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = PdfReader(mapped)
+        return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+class PDFProcessor:
+    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE
+        self.chunk_overlap = settings.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+
+    @staticmethod
+    def _to_documents(pages: List[Tuple[int, str]], total_pages: int) -> List[Document]:
+        return [
+            Document(page_content=text, metadata={"page": page_number, "total_pages": total_pages})
+            for page_number, text in pages if text
+        ]
+
+    def _collect(self, pages: List[Tuple[int, str]], total_pages: int) -> List[Document]:
+        PAGES.inc(len(pages))
+        return self._to_documents(pages, total_pages)
+
+    async def iter_pages(self, path: str) -> AsyncIterator[Document]:
+        """Yield one Document per non-empty page, in page order"""
+        try:
+            logger.info(f"Loading PDF from {path}")
+            loop = asyncio.get_running_loop()
+            executor = get_executor()
+            total_pages = await loop.run_in_executor(executor, _count_pages, path)
+
+            # Page ranges are extracted in parallel; a bounded window of ranges is kept
+            # in flight so extracted text is handed on instead of accumulating
+            step = max(1, settings.PDF_PAGES_PER_TASK)
+            window = max(1, settings.PDF_WORKERS * 2)
+            pending = []
+            try:
+                for start in range(0, total_pages, step):
+                    pending.append(loop.run_in_executor(
+                        executor, _extract_pages, path, start, min(start + step, total_pages)
+                    ))
+                    if len(pending) >= window:
+                        for document in self._collect(await pending.pop(0), total_pages):
+                            yield document
+                while pending:
+                    for document in self._collect(await pending.pop(0), total_pages):
+                        yield document
+            finally:
+                for future in pending:
+                    future.cancel()
+        except BrokenProcessPool as e:
+            # A worker was killed (out of memory, or a crash on a malformed PDF); the pool
+            # cannot run anything else, so replace it and fail only this file
+            logger.error(f"PDF extraction worker died while loading {path}: {e}")
+            _discard_executor(executor)
+            raise RuntimeError("PDF extraction failed because a worker process crashed") from e
+        except Exception as e:
+            logger.error(f"Error loading PDF: {e}")
+            raise
+
+    async def load_pdf(self, path: str) -> List[Document]:
+        return [page async for page in self.iter_pages(path)]
+
+    async def split_docs(self, documents: Union[Iterable[Document], AsyncIterable[Document]]) -> List[Document]:
+        try:
+            logger.info("Splitting documents into chunks")
+            chunker = StructuredChunker(self.chunk_size, self.chunk_overlap)
+            chunks = []
+            if not hasattr(documents, "__aiter__"):
+                for document in documents:
+                    chunks.extend(chunker.feed(document))
+            else:
+                # Split page by page as pages arrive from the extraction workers
+                async for document in documents:
+                    chunks.extend(chunker.feed(document))
+            chunks.extend(chunker.finish())
+            return chunks
+        except Exception as e:
+            logger.error(f"Error splitting documents: {e}")
             raise
\ No newline at end of file
@@ -0,0 +1,45 @@
+from typing import List, Optional, Sequence
+import numpy as np
+from ..config import settings
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def rerank(query_vectors: Sequence[Sequence[float]], candidate_vectors: np.ndarray,
+           term_overlap: Sequence[float], k: int, lexical_weight: Optional[float] = None,
+           mmr_lambda: Optional[float] = None, duplicate_threshold: Optional[float] = None) -> List[int]:
+    """Pick up to k candidates, best first, and return their indices.
+
+    Relevance blends each candidate's best cosine similarity to any query
+    vector with its query term overlap. Candidates are then chosen greedily
+    by maximal marginal relevance, and any candidate almost identical to one
+    already chosen (such as a neighbouring chunk sharing CHUNK_OVERLAP text)
+    is dropped. All similarities come from two matrix products.
+    """
+    lexical_weight = settings.RERANK_LEXICAL_WEIGHT if lexical_weight is None else lexical_weight
+    mmr_lambda = settings.RERANK_MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    duplicate_threshold = settings.RERANK_DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+    count = len(candidate_vectors)
+    if not count:
+        return []
+    queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+    candidates = _normalize(np.asarray(candidate_vectors, dtype=np.float32))
+    relevance = (1 - lexical_weight) * (candidates @ queries.T).max(axis=1)
+    relevance += lexical_weight * np.asarray(term_overlap, dtype=np.float32)
+    similarity = candidates @ candidates.T
+
+    selected = []
+    available = np.ones(count, dtype=bool)
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = np.zeros(count, dtype=np.float32)
+    for _ in range(min(k, count)):
+        scores = np.where(available, mmr_lambda * relevance - (1 - mmr_lambda) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        if not available[best]:
+            break
+        selected.append(best)
+        available &= similarity[best] < duplicate_threshold
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
@@ -1,77 +1,560 @@
-from langchain.vectorstores import FAISS
-from langchain_community.embeddings import OllamaEmbeddings
-from typing import List, Optional
-from langchain.schema import Document
-import os
-import shutil
-from ..config import settings
-import logging
-
-logger = logging.getLogger(__name__)
-
-class VectorDatabase:
-    def __init__(self):
-        self.embeddings = OllamaEmbeddings(model=settings.EMBEDDING_MODEL, base_url=settings.OLLAMA_BASE_URL)
-        self.index_path = os.path.join(settings.DATA_DIR, settings.VECTOR_DB_PATH)
-        self._db = None
-    
-    async def _load_db(self) -> Optional[FAISS]:
-        """Load the vector database if it exists"""
-        if os.path.exists(self.index_path):
-            try:
-                logger.info(f"Loading vector database from {self.index_path}")
-                # Set allow_dangerous_deserialization to True since we're loading our own files
-                return FAISS.load_local(self.index_path, self.embeddings, allow_dangerous_deserialization=True)
-            except Exception as e:
-                logger.error(f"Failed to load vector database: {e}")
-        return None
-    
-    async def create_db(self, documents: List[Document]) -> None:
-        """Create a new vector database from documents"""
-        try:
-            logger.info("Creating new vector database")
-            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-            
-            self._db = FAISS.from_documents(documents, self.embeddings)
-            self._db.save_local(self.index_path)
-            logger.info(f"Vector database saved to {self.index_path}")
-        except Exception as e:
-            logger.error(f"Error creating vector database: {e}")
-            raise
-    
-    async def search(self, query: str, k: int = 5) -> List[Document]:
-        """Search the vector database for relevant documents"""
-        try:
-            if self._db is None:
-                self._db = await self._load_db()
-                if self._db is None:
-                    logger.warning("No vector database found, returning empty results")
-                    return []
-            
-            logger.info(f"Searching for: {query}")
-            return self._db.similarity_search(query, k=k)
-        except Exception as e:
-            logger.error(f"Error searching vector database: {e}")
-            raise
-    
-    async def cleanup(self) -> None:
-        """Clean up the vector database by removing all files"""
-        try:
-            faiss_dir = os.path.join(settings.DATA_DIR, "faiss_index")
-            if os.path.exists(faiss_dir):
-                logger.info(f"Cleaning up vector database at {faiss_dir}")
-                
-                # Complete removal of the directory and recreation
-                shutil.rmtree(faiss_dir)
-                os.makedirs(faiss_dir, exist_ok=True)
-                
-                # Reset the database object
-                self._db = None
-                logger.info("Vector database cleaned up successfully")
-            else:
-                logger.info("No vector database directory found to clean up")
-                # Create the directory if it doesn't exist
-                os.makedirs(faiss_dir, exist_ok=True)
-        except Exception as e:
-            logger.error(f"Error cleaning up vector database: {e}")
-            raise
\ No newline at end of file
+from langchain.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from typing import Any, Callable, Dict, List, Optional
+from langchain.schema import Document
+import asyncio
+import faiss
+import json
+import numpy as np
+import os
+import shutil
+import uuid
+from ..config import settings
+from .embedding_cache import CachedEmbeddings, EmbeddingCache
+from .docstore import MmapDocstore, OverlayDocstore, has_docstore, write_docstore
+from .embeddings import OllamaBatchEmbeddings
+from .filelock import FileLock
+from .lexical import BM25Index, MmapBM25Index, has_lexical, reciprocal_rank_fusion
+from .metrics import CHUNKS, timed
+from .rerank import rerank
+from .index_factory import (
+    apply_search_params, build_index, describe, enable_reconstruct, index_params, index_type_of,
+    min_training_vectors, rebuild_without, reconstruct_all, reconstruct_positions, supports_removal
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SupersededError(Exception):
+    """Raised when a replacement is skipped because a newer upload has already been published"""
+
+_shared_db: Optional["VectorDatabase"] = None
+
+def get_vector_db() -> "VectorDatabase":
+    """Return the process-wide VectorDatabase, creating it on first use"""
+    global _shared_db
+    if _shared_db is None:
+        _shared_db = VectorDatabase()
+    return _shared_db
+
+class VectorDatabase:
+    def __init__(self):
+        self.embeddings = CachedEmbeddings(
+            OllamaBatchEmbeddings(),
+            EmbeddingCache(),
+            settings.EMBEDDING_MODEL
+        )
+        self.index_path = os.path.join(settings.DATA_DIR, settings.VECTOR_DB_PATH)
+        # Every worker process serves the same index directory: writers hold the lock
+        # exclusively and bump the version file, readers reload when it changes
+        self.lock = FileLock(f"{self.index_path}.lock")
+        self.version_path = f"{self.index_path}.version"
+        self._db = None
+        # BM25 index over the same chunks, swapped together with _db
+        self._lexical: Optional[MmapBM25Index] = None
+        self._loaded = False
+        self._load_lock = None
+        self._write_lock = None
+        # doc_id -> {"filename", "pages", "chunks", "created_at"}, published together with the index
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        # Version of the loaded index, incremented by whichever worker publishes a new one
+        self.version = 0
+
+    async def _load_db(self) -> Optional[FAISS]:
+        """Load the vector database, or return None if none has been saved.
+
+        A saved index that fails to load raises instead of looking empty, so a
+        writer never publishes over a corpus it could not read. documents and
+        the lexical index are only replaced once everything has loaded.
+        """
+        if not os.path.exists(os.path.join(self.index_path, "index.faiss")):
+            return None
+        try:
+            logger.info(f"Loading vector database from {self.index_path}")
+            documents = {}
+            documents_path = os.path.join(self.index_path, "documents.json")
+            if os.path.exists(documents_path):
+                with open(documents_path, "r") as f:
+                    documents = json.load(f)
+            if has_docstore(self.index_path):
+                db = await asyncio.to_thread(self._open)
+            else:
+                # Indexes saved by older versions keep the docstore in a pickle; load it once
+                # (allowed since it is our own file) and rewrite it in the current format
+                logger.info("Converting pickled docstore to the memory-mapped format")
+                db = await asyncio.to_thread(
+                    FAISS.load_local, self.index_path, self.embeddings, allow_dangerous_deserialization=True
+                )
+                apply_search_params(db.index)
+                await asyncio.to_thread(self._save, db, documents, self._build_lexical(db))
+                db = await asyncio.to_thread(self._open)
+            lexical = await asyncio.to_thread(self._load_lexical, db)
+        except Exception as e:
+            logger.error(f"Failed to load vector database: {e}")
+            raise
+        self.documents = documents
+        self._lexical = lexical
+        logger.info(f"Loaded {index_type_of(db.index)} index with {db.index.ntotal} vectors")
+        return db
+
+    def _open(self) -> FAISS:
+        """Open the saved index without deserializing the docstore"""
+        flags = 0
+        meta_path = os.path.join(self.index_path, "index_meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                # Flat, HNSW and PQ codes can be served straight from the page cache;
+                # memory-mapped IVF lists cannot be cloned for updates, so those are read
+                if json.load(f).get("index_type") not in ("ivf", "ivfpq"):
+                    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(os.path.join(self.index_path, "index.faiss"), flags)
+        apply_search_params(index)
+        # Re-ranking reads candidate vectors back out of the index
+        enable_reconstruct(index)
+        docstore = MmapDocstore(self.index_path)
+        return FAISS(self.embeddings, index, docstore, docstore.index_to_docstore_id())
+
+    def _load_lexical(self, db: FAISS) -> MmapBM25Index:
+        if not has_lexical(self.index_path):
+            # Indexes saved before hybrid search have none; build it once
+            # (the caller holds the exclusive lock, see get_db)
+            logger.info("No lexical index found, building one from the docstore")
+            self._build_lexical(db).save(self.index_path)
+        return MmapBM25Index.load(self.index_path)
+
+    @staticmethod
+    def _build_lexical(db: FAISS) -> MmapBM25Index:
+        """Build a BM25 index over every chunk of db"""
+        lexical = BM25Index()
+        lexical.add(db.docstore.search(id_) for id_ in db.index_to_docstore_id.values())
+        return MmapBM25Index.from_index(lexical)
+
+    def _get_write_lock(self) -> asyncio.Lock:
+        # Writers clone the current index, so they must not interleave or one update is lost
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        return self._write_lock
+
+    def _disk_version(self) -> int:
+        try:
+            with open(self.version_path, "r") as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_version(self, version: int) -> None:
+        # Only written under the exclusive lock, so the temporary name cannot collide
+        temp_path = f"{self.version_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(str(version))
+        os.replace(temp_path, self.version_path)
+
+    def _stale(self) -> bool:
+        return not self._loaded or self._disk_version() != self.version
+
+    async def _refresh(self) -> Optional[FAISS]:
+        """Reload the index if another worker published a newer one; the caller holds the file lock.
+
+        If loading fails the error propagates and the index stays marked stale,
+        so the next call tries again.
+        """
+        if self._stale():
+            version = self._disk_version()
+            db = await self._load_db()
+            if db is None:
+                self.documents = {}
+                self._lexical = None
+            self._db = db
+            self.version = version
+            self._loaded = True
+        return self._db
+
+    async def get_db(self) -> Optional[FAISS]:
+        """Return the loaded index, reloading it when any worker has published a newer one"""
+        if self._stale():
+            if self._load_lock is None:
+                self._load_lock = asyncio.Lock()
+            async with self._load_lock:
+                if self._stale():
+                    # Converting a legacy index rewrites it, so that load must exclude other workers
+                    legacy = (os.path.exists(os.path.join(self.index_path, "index.faiss"))
+                              and not (has_docstore(self.index_path) and has_lexical(self.index_path)))
+                    async with self.lock.hold(exclusive=legacy):
+                        await self._refresh()
+        return self._db
+
+    async def build_db(self, documents: List[Document],
+                       progress: Optional[Callable[[int], None]] = None) -> FAISS:
+        """Embed documents into a new index without touching the one being served"""
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+
+        async def embed_batch(batch: List[Document]):
+            vectors = await self.embeddings.aembed_documents([doc.page_content for doc in batch])
+            return batch, vectors
+
+        # Batches are embedded concurrently (bounded by EMBEDDING_CONCURRENCY)
+        # and added to the index in completion order
+        db = None
+        embedded = 0
+        for next_batch in asyncio.as_completed([embed_batch(batch) for batch in batches]):
+            batch, vectors = await next_batch
+            embedded += len(batch)
+            if progress:
+                progress(embedded)
+            text_embeddings = [(doc.page_content, vector) for doc, vector in zip(batch, vectors)]
+            # The docstore ID is also kept in metadata so retrieved chunks can be identified
+            ids = [uuid.uuid4().hex for _ in batch]
+            metadatas = [{**doc.metadata, "chunk_id": id_} for doc, id_ in zip(batch, ids)]
+            if db is None:
+                db = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+            else:
+                db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        if db is None:
+            raise ValueError("No documents to index")
+        return db
+
+    @staticmethod
+    def _apply_index_type(db: FAISS) -> None:
+        """Convert the index to FAISS_INDEX_TYPE once there are enough vectors to train it"""
+        target = settings.FAISS_INDEX_TYPE
+        current = index_type_of(db.index)
+        if current == target:
+            return
+        required = min_training_vectors(target, index_params(target, db.index.d, db.index.ntotal))
+        if db.index.ntotal < required:
+            logger.info(f"Keeping {current} index until {required} vectors are available to train {target}")
+            return
+        logger.info(f"Converting {current} index with {db.index.ntotal} vectors to {target}")
+        # Positions are preserved, so index_to_docstore_id stays valid
+        db.index = build_index(reconstruct_all(db.index), target)
+
+    @staticmethod
+    def _append(db: FAISS, new_db: FAISS) -> None:
+        """Add the vectors and documents of a freshly built flat index to db"""
+        count = new_db.index.ntotal
+        vectors = new_db.index.reconstruct_n(0, count)
+        ids = [new_db.index_to_docstore_id[i] for i in range(count)]
+        start = db.index.ntotal
+        db.index.add(vectors)
+        db.docstore.add({id_: new_db.docstore.search(id_) for id_ in ids})
+        db.index_to_docstore_id.update({start + i: id_ for i, id_ in enumerate(ids)})
+
+    @staticmethod
+    def _merge_lexical(base: Optional[MmapBM25Index], new: MmapBM25Index) -> MmapBM25Index:
+        return new if base is None else base.merge(new)
+
+    @staticmethod
+    def _remove(db: FAISS, ids: List[str]) -> None:
+        """Remove documents by docstore ID, rebuilding indexes that cannot drop vectors"""
+        if supports_removal(db.index):
+            db.delete(ids)
+            return
+        removed = set(ids)
+        keep = [i for i, id_ in sorted(db.index_to_docstore_id.items()) if id_ not in removed]
+        remaining = [db.index_to_docstore_id[i] for i in keep]
+        db.index = rebuild_without(db.index, np.array(keep, dtype="int64"))
+        db.docstore.delete(ids)
+        db.index_to_docstore_id = dict(enumerate(remaining))
+
+    @staticmethod
+    def _clone(db: FAISS) -> FAISS:
+        """Copy an index so it can be modified while readers keep using the original"""
+        if isinstance(db.docstore, MmapDocstore):
+            # Unchanged documents stay on disk and are copied as raw records when saved
+            docstore = OverlayDocstore(db.docstore)
+        else:
+            docstore = InMemoryDocstore(dict(db.docstore._dict))
+        return FAISS(
+            db.embedding_function,
+            faiss.clone_index(db.index),
+            docstore,
+            dict(db.index_to_docstore_id)
+        )
+
+    def _save(self, db: Optional[FAISS], documents: Dict[str, Dict[str, Any]],
+              lexical: Optional[MmapBM25Index]) -> None:
+        # Write next to the live index and swap directories, so a crash never
+        # leaves a half-written index in place
+        staging_path = f"{self.index_path}.new"
+        old_path = f"{self.index_path}.old"
+        shutil.rmtree(staging_path, ignore_errors=True)
+        os.makedirs(staging_path)
+        if db is not None:
+            faiss.write_index(db.index, os.path.join(staging_path, "index.faiss"))
+            write_docstore(staging_path, db.docstore, db.index_to_docstore_id)
+            with open(os.path.join(staging_path, "documents.json"), "w") as f:
+                json.dump(documents, f)
+            with open(os.path.join(staging_path, "index_meta.json"), "w") as f:
+                json.dump(describe(db.index), f)
+            if lexical is not None:
+                lexical.save(staging_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.index_path):
+            os.rename(self.index_path, old_path)
+        os.rename(staging_path, self.index_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    async def publish(self, db: Optional[FAISS], documents: Optional[Dict[str, Dict[str, Any]]] = None,
+                      lexical: Optional[MmapBM25Index] = None) -> None:
+        """Persist a new index and atomically make it the one served to readers.
+
+        The caller holds the write lock and the exclusive file lock.
+        """
+        documents = documents if db is not None and documents is not None else {}
+        lexical = lexical if db is not None else None
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        await asyncio.to_thread(self._save, db, documents, lexical)
+        if db is not None:
+            # Serve the saved copies, so documents and postings stay on disk until a search needs them
+            db = await asyncio.to_thread(self._open)
+            if lexical is not None:
+                lexical = await asyncio.to_thread(MmapBM25Index.load, self.index_path)
+        version = self._disk_version() + 1
+        self._write_version(version)
+        # Searches already in flight keep the reference to the previous index
+        self._db = db
+        self._lexical = lexical
+        self.documents = documents
+        self._loaded = True
+        self.version = version
+        logger.info(f"Vector database saved to {self.index_path} (version {self.version})")
+
+    async def create_db(self, documents: List[Document]) -> None:
+        """Create a new vector database from documents"""
+        try:
+            logger.info("Creating new vector database")
+            db = await self.build_db(documents)
+            lexical = await asyncio.to_thread(self._build_lexical, db)
+            await asyncio.to_thread(self._apply_index_type, db)
+            async with self._get_write_lock(), self.lock.hold():
+                await self.publish(db, lexical=lexical)
+        except Exception as e:
+            logger.error(f"Error creating vector database: {e}")
+            raise
+
+    async def add_document(self, doc_id: str, chunks: List[Document], info: Dict[str, Any],
+                           replace: bool = False, progress: Optional[Callable[[int], None]] = None) -> None:
+        """Index one PDF's chunks, appending them to the corpus or replacing it.
+
+        A replacement is skipped with SupersededError when the index already
+        holds a document submitted after this one (info["submitted_at"]), so
+        the last upload wins rather than the last to finish embedding.
+        """
+        try:
+            for chunk in chunks:
+                chunk.metadata["doc_id"] = doc_id
+            # Only the new chunks are embedded; the existing vectors are reused as-is
+            with timed("upload", "embed"):
+                new_db = await self.build_db(chunks, progress)
+            new_lexical = await asyncio.to_thread(self._build_lexical, new_db)
+
+            async with self._get_write_lock(), self.lock.hold():
+                with timed("upload", "index"):
+                    # Another worker may have published since this one last loaded the index
+                    base = await self._refresh()
+                    if replace:
+                        submitted_at = info.get("submitted_at") or ""
+                        if any((current.get("submitted_at") or "") > submitted_at
+                               for current in self.documents.values()):
+                            raise SupersededError("A newer upload replaced this document before it was indexed")
+                        base = None
+                    if base is None:
+                        db, documents, lexical = new_db, {}, new_lexical
+                    else:
+                        logger.info(f"Appending {len(chunks)} chunks to the existing vector database")
+                        db = await asyncio.to_thread(self._clone, base)
+                        await asyncio.to_thread(self._append, db, new_db)
+                        documents = dict(self.documents)
+                        lexical = await asyncio.to_thread(self._merge_lexical, self._lexical, new_lexical)
+                    await asyncio.to_thread(self._apply_index_type, db)
+                    documents[doc_id] = {**info, "chunks": len(chunks)}
+                    await self.publish(db, documents, lexical)
+            CHUNKS.inc(len(chunks))
+        except SupersededError:
+            logger.info(f"Skipped publishing document {doc_id}; a newer upload is already indexed")
+            raise
+        except Exception as e:
+            logger.error(f"Error adding document to vector database: {e}")
+            raise
+
+    async def delete_document(self, doc_id: str) -> bool:
+        """Remove one document's vectors; returns False if the document is unknown"""
+        try:
+            async with self._get_write_lock(), self.lock.hold():
+                base = await self._refresh()
+                if base is None or doc_id not in self.documents:
+                    return False
+                # The lexical index maps documents to chunks without parsing the docstore
+                ids = self._lexical.chunk_ids_of(doc_id)
+                documents = dict(self.documents)
+                documents.pop(doc_id)
+                if len(ids) == len(base.index_to_docstore_id):
+                    await self.publish(None)
+                else:
+                    db = await asyncio.to_thread(self._clone, base)
+                    lexical = await asyncio.to_thread(self._lexical.without, ids)
+                    if ids:
+                        await asyncio.to_thread(self._remove, db, ids)
+                    await self.publish(db, documents, lexical)
+                logger.info(f"Deleted document {doc_id} ({len(ids)} chunks)")
+                return True
+        except Exception as e:
+            logger.error(f"Error deleting document from vector database: {e}")
+            raise
+
+    async def current_version(self) -> int:
+        """Version of the index searches will use, after reloading any newer one another worker published"""
+        await self.get_db()
+        return self.version
+
+    async def list_documents(self) -> List[Dict[str, Any]]:
+        """Return the documents in the current index"""
+        await self.get_db()
+        return [{"id": doc_id, **info} for doc_id, info in self.documents.items()]
+
+    async def warm_up(self) -> None:
+        """Load the index and the embedding model ahead of the first request"""
+        await self.get_db()
+        # Bypass the embedding cache so the request reaches Ollama and loads the model
+        await self.embeddings.embeddings.aembed_query("warm-up")
+
+    async def embed_query(self, query: str) -> List[float]:
+        return await self.embeddings.aembed_query(query)
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_queries(queries)
+
+    async def search(self, query: str, k: Optional[int] = None,
+                     document_ids: Optional[List[str]] = None) -> List[Document]:
+        """Search the vector database for relevant documents, optionally within some documents"""
+        logger.info(f"Searching for: {query}")
+        k = k or settings.RETRIEVAL_K
+        if settings.LEXICAL_FAST_PATH:
+            documents = await self.lexical_fast_path(query, k, document_ids)
+            if documents is not None:
+                return documents
+        return await self.hybrid_search(query, await self.embed_query(query), k, document_ids)
+
+    async def lexical_fast_path(self, query: str, k: Optional[int] = None,
+                                document_ids: Optional[List[str]] = None) -> Optional[List[Document]]:
+        """Answer from BM25 alone when the best chunk contains every identifier in the query.
+
+        Returns None when the lexical match is not strong enough and a
+        dense search is needed.
+        """
+        db, lexical = await self.get_db(), self._lexical
+        if db is None or lexical is None:
+            return None
+        hits = await asyncio.to_thread(lexical.search, query, k or settings.RETRIEVAL_K, document_ids)
+        if not hits or not lexical.identifiers_matched(query, hits[0][0]):
+            return None
+        logger.info(f"Lexical fast path matched {len(hits)} chunks")
+        return [db.docstore.search(chunk_id) for chunk_id, _ in hits]
+
+    async def hybrid_search(self, query: str, vector: List[float], k: Optional[int] = None,
+                            document_ids: Optional[List[str]] = None) -> List[Document]:
+        """Fuse the dense and BM25 rankings with reciprocal rank fusion"""
+        return await self.multi_search([query], [vector], k, document_ids)
+
+    async def multi_search(self, queries: List[str], vectors: List[List[float]], k: Optional[int] = None,
+                           document_ids: Optional[List[str]] = None) -> List[Document]:
+        """Search with several phrasings of a question and fuse every ranking into one.
+
+        All query vectors go to FAISS in a single batched search, and each
+        chunk appears once in the result however many rankings found it.
+        With re-ranking on, the best RERANK_CANDIDATES fused chunks are
+        re-scored and diversified before the top k are returned. Rankings
+        are fused on chunk IDs; only the k returned chunks are read from
+        the docstore.
+        """
+        try:
+            db, lexical = await self.get_db(), self._lexical
+            if db is None:
+                logger.warning("No vector database found, returning empty results")
+                return []
+            k = k or settings.RETRIEVAL_K
+            candidates = max(k, settings.RETRIEVAL_CANDIDATES)
+            if settings.RERANK_ENABLED:
+                candidates = max(candidates, settings.RERANK_CANDIDATES)
+            # The dense and lexical searches run side by side in worker threads
+            dense, lexical_hits = await asyncio.gather(
+                asyncio.to_thread(self._search_many, db, lexical, vectors, candidates, document_ids),
+                asyncio.to_thread(
+                    lambda: [lexical.search(query, candidates, document_ids) for query in queries] if lexical else []
+                )
+            )
+            rankings = dense + [[chunk_id for chunk_id, _ in hits] for hits in lexical_hits]
+            fused = reciprocal_rank_fusion(rankings)
+            if settings.RERANK_ENABLED and len(fused) > 1:
+                pool = [chunk_id for chunk_id, _ in fused[:settings.RERANK_CANDIDATES]]
+                with timed("chat", "rerank"):
+                    chosen = await asyncio.to_thread(self._rerank, db, lexical, queries, vectors, pool, k)
+            else:
+                chosen = [chunk_id for chunk_id, _ in fused[:k]]
+            return [db.docstore.search(chunk_id) for chunk_id in chosen]
+        except Exception as e:
+            logger.error(f"Error searching vector database: {e}")
+            raise
+
+    @staticmethod
+    def _positions(db: FAISS, chunk_ids: List[str]) -> np.ndarray:
+        if isinstance(db.docstore, MmapDocstore):
+            return db.docstore.positions(chunk_ids)
+        lookup = {id_: position for position, id_ in db.index_to_docstore_id.items()}
+        return np.array([lookup[id_] for id_ in chunk_ids], dtype=np.int64)
+
+    @classmethod
+    def _rerank(cls, db: FAISS, lexical: Optional[MmapBM25Index], queries: List[str],
+                vectors: List[List[float]], chunk_ids: List[str], k: int) -> List[str]:
+        """Re-score candidates with their stored vectors and term overlap; returns the chosen IDs"""
+        candidate_vectors = reconstruct_positions(db.index, cls._positions(db, chunk_ids))
+        overlap = lexical.term_overlap(queries, chunk_ids) if lexical is not None else [0.0] * len(chunk_ids)
+        return [chunk_ids[i] for i in rerank(vectors, candidate_vectors, overlap, k)]
+
+    @staticmethod
+    def _search_many(db: FAISS, lexical: Optional[MmapBM25Index], vectors: List[List[float]], k: int,
+                     document_ids: Optional[List[str]] = None) -> List[List[str]]:
+        """Run one batched FAISS search and return the k best chunk IDs per query vector"""
+        # Over-fetch so enough hits survive the document filter
+        fetch = min(max(k, settings.SEARCH_FILTER_FETCH_K) if document_ids else k, db.index.ntotal)
+        _, positions = db.index.search(np.asarray(vectors, dtype=np.float32), fetch)
+        results = []
+        for row in positions:
+            chunk_ids = [db.index_to_docstore_id[int(position)] for position in row if position >= 0]
+            if document_ids:
+                # The lexical index maps chunks to documents without parsing any record
+                if lexical is not None:
+                    keep = lexical.in_documents(chunk_ids, document_ids)
+                else:
+                    keep = [db.docstore.search(chunk_id).metadata.get("doc_id") in document_ids
+                            for chunk_id in chunk_ids]
+                chunk_ids = [chunk_id for chunk_id, kept in zip(chunk_ids, keep) if kept]
+            results.append(chunk_ids[:k])
+        return results
+
+    async def cleanup(self) -> None:
+        """Clean up the vector database by removing all files"""
+        try:
+            async with self.lock.hold():
+                if os.path.exists(self.index_path):
+                    logger.info(f"Cleaning up vector database at {self.index_path}")
+
+                    # Complete removal of the directory and recreation
+                    shutil.rmtree(self.index_path)
+                    os.makedirs(self.index_path, exist_ok=True)
+
+                    # Reset the database object; other workers see the new version and drop theirs
+                    self._db = None
+                    self._lexical = None
+                    self.documents = {}
+                    self.version = self._disk_version() + 1
+                    self._write_version(self.version)
+                    logger.info("Vector database cleaned up successfully")
+                else:
+                    logger.info("No vector database directory found to clean up")
+                    # Create the directory if it doesn't exist
+                    os.makedirs(self.index_path, exist_ok=True)
+        except Exception as e:
+            logger.error(f"Error cleaning up vector database: {e}")
+            raise
@@ -1,120 +1,197 @@
-import json
-import os
-import uuid
-from datetime import datetime
-from typing import List, Dict, Any, Optional
-import logging
-import shutil
-from ..config import settings
-
-logger = logging.getLogger(__name__)
-
-class FileStorage:
-    @staticmethod
-    async def save(collection: str, data: Dict[str, Any]) -> str:
-        """Save data to a file and return the ID"""
-        if "id" not in data:
-            data["id"] = str(uuid.uuid4())
-        
-        if "timestamp" not in data:
-            data["timestamp"] = datetime.utcnow().isoformat()
-        
-        collection_dir = os.path.join(settings.DATA_DIR, collection)
-        os.makedirs(collection_dir, exist_ok=True)
-        
-        file_path = os.path.join(collection_dir, f"{data['id']}.json")
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=2)
-        
-        return data["id"]
-    
-    @staticmethod
-    async def get(collection: str, item_id: str) -> Optional[Dict[str, Any]]:
-        """Get an item by ID"""
-        file_path = os.path.join(settings.DATA_DIR, collection, f"{item_id}.json")
-        if not os.path.exists(file_path):
-            return None
-        
-        with open(file_path, "r") as f:
-            return json.load(f)
-    
-    @staticmethod
-    async def list(collection: str, sort_by: str = None, reverse: bool = False) -> List[Dict[str, Any]]:
-        """List all items in a collection"""
-        collection_dir = os.path.join(settings.DATA_DIR, collection)
-        if not os.path.exists(collection_dir):
-            return []
-        
-        items = []
-        for filename in os.listdir(collection_dir):
-            if filename.endswith(".json"):
-                file_path = os.path.join(collection_dir, filename)
-                with open(file_path, "r") as f:
-                    items.append(json.load(f))
-        
-        if sort_by and items:
-            items.sort(key=lambda x: x.get(sort_by, ""), reverse=reverse)
-        
-        return items
-
-class ChatHistory:
-    """File-based chat history storage"""
-    DATA_DIR = os.path.join(settings.DATA_DIR, "chat_history")
-    
-    @classmethod
-    async def create(cls, question: str, answer: str) -> Dict[str, Any]:
-        """Save a new chat message to file storage"""
-        os.makedirs(cls.DATA_DIR, exist_ok=True)
-        
-        chat_id = str(uuid.uuid4())
-        timestamp = datetime.now().isoformat()
-        
-        chat_data = {
-            "id": chat_id,
-            "question": question,
-            "answer": answer,
-            "timestamp": timestamp
-        }
-        
-        file_path = os.path.join(cls.DATA_DIR, f"{chat_id}.json")
-        with open(file_path, "w") as f:
-            json.dump(chat_data, f)
-            
-        logger.info(f"Saved chat message with ID: {chat_id}")
-        return chat_data
-    
-    @classmethod
-    async def get_all(cls) -> List[Dict[str, Any]]:
-        """Retrieve all chat messages"""
-        if not os.path.exists(cls.DATA_DIR):
-            return []
-            
-        result = []
-        for filename in os.listdir(cls.DATA_DIR):
-            if filename.endswith('.json'):
-                file_path = os.path.join(cls.DATA_DIR, filename)
-                try:
-                    with open(file_path, "r") as f:
-                        chat_data = json.load(f)
-                        result.append(chat_data)
-                except Exception as e:
-                    logger.error(f"Error reading chat file {filename}: {e}")
-                    
-        # Sort by timestamp descending
-        result.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        return result
-    
-    @classmethod
-    async def clear_all(cls) -> None:
-        """Delete all chat history"""
-        if os.path.exists(cls.DATA_DIR):
-            try:
-                logger.info(f"Clearing all chat history from {cls.DATA_DIR}")
-                for filename in os.listdir(cls.DATA_DIR):
-                    if filename.endswith('.json'):
-                        file_path = os.path.join(cls.DATA_DIR, filename)
-                        os.remove(file_path)
-                logger.info("Chat history cleared")
-            except Exception as e:
-                logger.error(f"Error clearing chat history: {e}")
-                raise
\ No newline at end of file
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import logging
+import shutil
+from ..config import settings
+from ..core.filelock import FileLock
+from .session import run_db
+
+logger = logging.getLogger(__name__)
+
+class FileStorage:
+    """Generic JSON record storage, backed by the SQLite records table"""
+
+    @staticmethod
+    async def save(collection: str, data: Dict[str, Any]) -> str:
+        """Save data to a collection and return the ID"""
+        if "id" not in data:
+            data["id"] = str(uuid.uuid4())
+        
+        if "timestamp" not in data:
+            data["timestamp"] = datetime.utcnow().isoformat()
+        
+        def insert(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO records (collection, id, timestamp, data) VALUES (?, ?, ?, ?)",
+                (collection, data["id"], data["timestamp"], json.dumps(data))
+            )
+            conn.commit()
+
+        await run_db(insert)
+        return data["id"]
+    
+    @staticmethod
+    async def get(collection: str, item_id: str) -> Optional[Dict[str, Any]]:
+        """Get an item by ID"""
+        row = await run_db(lambda conn: conn.execute(
+            "SELECT data FROM records WHERE collection = ? AND id = ?", (collection, item_id)
+        ).fetchone())
+        return json.loads(row["data"]) if row else None
+    
+    @staticmethod
+    async def list(collection: str, sort_by: str = None, reverse: bool = False) -> List[Dict[str, Any]]:
+        """List all items in a collection"""
+        # Timestamp ordering comes straight from the index; other keys are sorted in memory
+        order = "DESC" if reverse else "ASC"
+        rows = await run_db(lambda conn: conn.execute(
+            f"SELECT data FROM records WHERE collection = ? ORDER BY timestamp {order}", (collection,)
+        ).fetchall())
+        items = [json.loads(row["data"]) for row in rows]
+        
+        if sort_by and sort_by != "timestamp" and items:
+            items.sort(key=lambda x: x.get(sort_by, ""), reverse=reverse)
+        
+        return items
+
+    @staticmethod
+    async def delete_before(collection: str, timestamp: str) -> int:
+        """Delete the items of a collection saved before timestamp and return how many were removed"""
+        def delete(conn):
+            count = conn.execute(
+                "DELETE FROM records WHERE collection = ? AND timestamp < ?", (collection, timestamp)
+            ).rowcount
+            conn.commit()
+            return count
+
+        return await run_db(delete)
+
+class ChatHistory:
+    """Append-only chat history stored in SQLite with a timestamp index"""
+    # Directory used by the previous one-JSON-file-per-message format, imported on first use
+    LEGACY_DIR = os.path.join(settings.DATA_DIR, "chat_history")
+    _migrated = False
+
+    @classmethod
+    async def _ensure_migrated(cls) -> None:
+        if cls._migrated:
+            return
+        if os.path.isdir(cls.LEGACY_DIR):
+            # Every worker process checks on first use; the lock lets exactly one of them import
+            async with FileLock(f"{cls.LEGACY_DIR}.lock").hold():
+                if os.path.isdir(cls.LEGACY_DIR):
+                    await cls._import_legacy()
+        cls._migrated = True
+
+    @classmethod
+    async def _import_legacy(cls) -> None:
+        def migrate(conn):
+            rows = []
+            for filename in os.listdir(cls.LEGACY_DIR):
+                if filename.endswith('.json'):
+                    try:
+                        with open(os.path.join(cls.LEGACY_DIR, filename), "r") as f:
+                            chat_data = json.load(f)
+                        rows.append((chat_data["id"], chat_data["id"], chat_data["question"],
+                                     chat_data["answer"], chat_data["timestamp"]))
+                    except Exception as e:
+                        logger.error(f"Error reading chat file {filename}: {e}")
+            rows.sort(key=lambda row: row[4])
+            conn.executemany(
+                "INSERT OR IGNORE INTO chat_history (id, chat_id, question, answer, timestamp) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+            return len(rows)
+
+        count = await run_db(migrate)
+        shutil.move(cls.LEGACY_DIR, f"{cls.LEGACY_DIR}.migrated")
+        logger.info(f"Imported {count} chat messages from {cls.LEGACY_DIR}")
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "seq": row["seq"],
+            "chat_id": row["chat_id"],
+            "question": row["question"],
+            "answer": row["answer"],
+            "timestamp": row["timestamp"]
+        }
+    
+    @classmethod
+    async def create(cls, question: str, answer: str, chat_id: Optional[str] = None) -> Dict[str, Any]:
+        """Append a new chat message; chat_id is the client's ID and may repeat"""
+        await cls._ensure_migrated()
+        
+        chat_data = {
+            "id": str(uuid.uuid4()),
+            "chat_id": chat_id,
+            "question": question,
+            "answer": answer,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        def insert(conn):
+            seq = conn.execute(
+                "INSERT INTO chat_history (id, chat_id, question, answer, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (chat_data["id"], chat_id, question, answer, chat_data["timestamp"])
+            ).lastrowid
+            conn.commit()
+            return seq
+
+        chat_data["seq"] = await run_db(insert)
+        logger.info(f"Saved chat message with ID: {chat_data['id']}")
+        return chat_data
+
+    @classmethod
+    async def get_page(cls, limit: int, before: Optional[str] = None,
+                       before_seq: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return up to limit messages older than the (before, before_seq) cursor, newest first.
+
+        Pass the timestamp and seq of the last message of a page; seq breaks
+        ties between messages saved with the same timestamp.
+        """
+        await cls._ensure_migrated()
+        columns = "seq, id, chat_id, question, answer, timestamp"
+
+        def query(conn):
+            if before and before_seq is not None:
+                return conn.execute(
+                    f"SELECT {columns} FROM chat_history WHERE (timestamp, seq) < (?, ?) "
+                    "ORDER BY timestamp DESC, seq DESC LIMIT ?", (before, before_seq, limit)
+                ).fetchall()
+            if before:
+                return conn.execute(
+                    f"SELECT {columns} FROM chat_history WHERE timestamp < ? "
+                    "ORDER BY timestamp DESC, seq DESC LIMIT ?", (before, limit)
+                ).fetchall()
+            return conn.execute(
+                f"SELECT {columns} FROM chat_history ORDER BY timestamp DESC, seq DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+        return [cls._to_dict(row) for row in await run_db(query)]
+    
+    @classmethod
+    async def get_all(cls) -> List[Dict[str, Any]]:
+        """Retrieve all chat messages, newest first"""
+        return await cls.get_page(-1)
+    
+    @classmethod
+    async def clear_all(cls) -> None:
+        """Delete all chat history"""
+        await cls._ensure_migrated()
+        try:
+            logger.info("Clearing all chat history")
+
+            def delete(conn):
+                conn.execute("DELETE FROM chat_history")
+                conn.commit()
+
+            await run_db(delete)
+            logger.info("Chat history cleared")
+        except Exception as e:
+            logger.error(f"Error clearing chat history: {e}")
+            raise
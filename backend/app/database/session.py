@@ -1,17 +1,75 @@
-import os
-from ..config import settings
-import logging
-
-logger = logging.getLogger(__name__)
-
-# This function is no longer needed but kept for API compatibility
-# We could remove it entirely if we update all its references
-async def get_db():
-    yield None
-
-async def init_db():
-    """Initialize file directories for data storage"""
-    # Create data directories
-    os.makedirs(os.path.join(settings.DATA_DIR), exist_ok=True)
-    os.makedirs(os.path.join(settings.DATA_DIR, "chat_history"), exist_ok=True)
-    logger.info("File storage initialized")
+from typing import Callable, Optional, TypeVar
+import asyncio
+import os
+import sqlite3
+import threading
+from ..config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    chat_id TEXT,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp_seq ON chat_history (timestamp, seq);
+CREATE INDEX IF NOT EXISTS idx_chat_history_chat_id ON chat_history (chat_id);
+CREATE TABLE IF NOT EXISTS records (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records (collection, timestamp);
+"""
+
+# This function is no longer needed but kept for API compatibility
+# We could remove it entirely if we update all its references
+async def get_db():
+    yield None
+
+def get_connection() -> sqlite3.Connection:
+    """Return the process-wide SQLite connection, creating the schema on first use"""
+    global _connection
+    if _connection is None:
+        with _lock:
+            if _connection is None:
+                os.makedirs(settings.DATA_DIR, exist_ok=True)
+                path = os.path.join(settings.DATA_DIR, settings.DATABASE_PATH)
+                conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+                conn.row_factory = sqlite3.Row
+                # WAL lets readers proceed while a message is being appended
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA)
+                conn.commit()
+                _connection = conn
+                logger.info(f"SQLite storage opened at {path}")
+    return _connection
+
+def _locked(fn: Callable[[sqlite3.Connection], T]) -> T:
+    conn = get_connection()
+    with _lock:
+        return fn(conn)
+
+async def run_db(fn: Callable[[sqlite3.Connection], T]) -> T:
+    """Run fn(connection) in a worker thread so SQLite I/O never blocks the event loop"""
+    return await asyncio.to_thread(_locked, fn)
+
+async def init_db():
+    """Initialize data directories and the SQLite schema"""
+    # Create data directories
+    os.makedirs(os.path.join(settings.DATA_DIR), exist_ok=True)
+    await run_db(lambda conn: None)
+    logger.info("File storage initialized")
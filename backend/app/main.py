@@ -1,52 +1,79 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import logging
-from .api.endpoints import pdf, chat
-import os
-from .core.vector_store import VectorDatabase
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
-
-app = FastAPI(title="PDF Chat API")
-
-# Add CORS middleware - Allow specific origin for more security
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # Specifically allow the frontend URL
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Create data directories if they don't exist
-os.makedirs("./data/vector_db", exist_ok=True)
-
-# Include routers
-app.include_router(pdf.router, prefix="/api/pdf", tags=["pdf"])
-app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
-
-@app.get("/api/health")
-async def health_check():
-    return {"status": "healthy"}
-
-# Add a root endpoint for basic testing
-@app.get("/")
-async def root():
-    return {"message": "PDF Chat API is running"}
-
-# Create vector database instance
-vector_db = VectorDatabase()
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup resources on application shutdown"""
-    logging.info("Application shutdown: cleaning up resources")
-    try:
-        await vector_db.cleanup()
-        logging.info("Vector database cleaned up successfully")
-    except Exception as e:
-        logging.error(f"Error cleaning up vector database: {e}")
\ No newline at end of file
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+import logging
+from .api.endpoints import pdf, chat
+import os
+from .core.metrics import render_metrics
+from .services.ingestion import get_ingestion_queue
+from .services.warmup import get_warmup
+from .config import settings
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+app = FastAPI(title="PDF Chat API")
+
+# Add CORS middleware - Allow specific origin for more security
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000"],  # Specifically allow the frontend URL
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Create data directories if they don't exist
+os.makedirs("./data/vector_db", exist_ok=True)
+
+# Include routers
+app.include_router(pdf.router, prefix="/api/pdf", tags=["pdf"])
+app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
+
+@app.get("/api/health")
+async def health_check():
+    return {"status": "healthy"}
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Unlike /api/health, only succeeds once Ollama serves both models and any warm-up is done"""
+    ready, checks = await get_warmup().check()
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "not ready", **checks})
+    return {"status": "ready", **checks}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and pipeline counters in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Add a root endpoint for basic testing
+@app.get("/")
+async def root():
+    return {"message": "PDF Chat API is running"}
+
+@app.on_event("startup")
+async def startup_event():
+    # The retrieval stack is imported on first use unless PREWARM loads it in the background
+    get_warmup().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Cleanup resources on application shutdown"""
+    logging.info("Application shutdown: cleaning up resources")
+    await get_warmup().stop()
+    # Stop ingestion first so no job publishes an index after the cleanup
+    await get_ingestion_queue().shutdown()
+    # A multi-document corpus is kept across restarts
+    if not settings.MULTI_DOCUMENT:
+        try:
+            from .core.vector_store import get_vector_db
+            await get_vector_db().cleanup()
+            logging.info("Vector database cleaned up successfully")
+        except Exception as e:
+            logging.error(f"Error cleaning up vector database: {e}")
+    from .core.pdf import shutdown_executor
+    shutdown_executor()
\ No newline at end of file
@@ -1,79 +1,253 @@
-from ..core.llm import LLMHandler
-from ..core.vector_store import VectorDatabase
-from ..database.models import ChatHistory
-from typing import List, AsyncGenerator, Dict, Any
-import asyncio
-import logging
-
-logger = logging.getLogger(__name__)
-
-class ChatService:
-    def __init__(self):
-        self.llm = LLMHandler()
-        self.vector_db = VectorDatabase()
-        self.current_generation = {}
-
-    async def process_message(self, message: str):
-        try:
-            # Always get a fresh instance of the vector database
-            self.vector_db = VectorDatabase()
-            
-            # Get relevant documents from vector database
-            relevant_docs = await self.vector_db.search(message)
-            
-            if not relevant_docs:
-                logger.warning("No relevant documents found in vector database")
-                
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
-            
-            # Get the response from LLM
-            response = await self.llm.generate_response(message, context)
-            
-            # Save to chat history
-            chat_history = await ChatHistory.create(
-                question=message,
-                answer=response
-            )
-            
-            # Return the complete response for immediate display
-            return {
-                "id": chat_history["id"],
-                "question": message,
-                "answer": response,
-                "timestamp": chat_history["timestamp"]
-            }
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            raise Exception(f"Error processing message: {e}")
-
-    async def stream_response(self, chat_id: str) -> AsyncGenerator[str, None]:
-        try:
-            self.current_generation[chat_id] = True
-            response = ""
-            
-            while self.current_generation[chat_id]:
-                if not response:
-                    yield "..."
-                    await asyncio.sleep(0.1)
-                else:
-                    for token in response.split():
-                        if not self.current_generation[chat_id]:
-                            break
-                        yield token
-                        await asyncio.sleep(0.05)
-                    break
-                    
-        except Exception as e:
-            yield f"Error: {str(e)}"
-        finally:
-            self.current_generation.pop(chat_id, None)
-
-    async def get_chat_history(self) -> List[Dict[str, Any]]:
-        return await ChatHistory.get_all()
-
-    async def clear_chat_history(self) -> None:
-        """Clear all chat history"""
-        try:
-            await ChatHistory.clear_all()
-        except Exception as e:
-            raise Exception(f"Error clearing chat history: {e}")
\ No newline at end of file
+from ..core.llm import LLMHandler
+from ..core.vector_store import get_vector_db
+from ..core.admission import OverloadedError
+from ..core.answer_cache import AnswerCache
+from ..core.context import ContextBuilder
+from ..core.metrics import RETRIEVALS, STAGE_SECONDS, timed
+from ..database.models import ChatHistory
+from ..config import settings
+from langchain.schema import Document
+from typing import List, AsyncGenerator, Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class ChatService:
+    def __init__(self):
+        self.llm = LLMHandler()
+        self.vector_db = get_vector_db()
+        self.answer_cache = AnswerCache()
+        self.context_builder = ContextBuilder()
+        self.current_generation = {}
+        # Marker files let a stop request reach a stream served by another worker process
+        self.generations_dir = os.path.join(settings.DATA_DIR, "generations")
+
+    def _marker(self, chat_id: str, suffix: str) -> str:
+        # Hashed so any chat ID is a safe file name
+        name = hashlib.sha256(chat_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.generations_dir, f"{name}{suffix}")
+
+    @staticmethod
+    def _remove_marker(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    async def _query_variants(self, message: str) -> List[str]:
+        try:
+            with timed("chat", "query_variants"):
+                return await self.llm.generate_query_variants(message)
+        except Exception as e:
+            # Multi-query only improves recall, so fall back to the original question
+            logger.warning(f"Could not generate query variants, searching with the question only: {e}")
+            return []
+
+    async def _retrieve(self, message: str, document_ids: Optional[List[str]] = None, multi_query: bool = False
+                        ) -> Tuple[Optional[List[float]], int, Optional[Dict[str, Any]], List[Document]]:
+        """Embed the question once and return (vector, index version, cached answer, documents).
+
+        The vector is None when the lexical fast path answered without an embedding.
+        A cached answer is the answer cache entry, holding "answer" and "sources".
+        """
+        # Read the version first so an answer is never cached against a newer index than it used;
+        # it is checked against disk, so a publish by another worker invalidates cached answers here too
+        version = await self.vector_db.current_version()
+        if settings.LEXICAL_FAST_PATH:
+            with timed("chat", "lexical_fast_path"):
+                relevant_docs = await self.vector_db.lexical_fast_path(message, document_ids=document_ids)
+            if relevant_docs is not None:
+                RETRIEVALS.inc(path="lexical")
+                return None, version, None, relevant_docs
+
+        # Rephrasing needs a model call, so it runs while the question is embedded and looked up
+        variants_task = asyncio.create_task(self._query_variants(message)) if multi_query else None
+        try:
+            with timed("chat", "embed_query"):
+                vector = await self.vector_db.embed_query(message)
+
+            if settings.ANSWER_CACHE_ENABLED:
+                with timed("chat", "answer_cache"):
+                    cached = self.answer_cache.lookup(vector, version, document_ids)
+                if cached:
+                    logger.info(f"Answer cache hit (similarity {cached['similarity']:.3f})")
+                    RETRIEVALS.inc(path="answer_cache")
+                    return vector, version, cached, []
+
+            queries, vectors = [message], [vector]
+            if variants_task is not None:
+                variants = await variants_task
+                if variants:
+                    logger.info(f"Searching with {len(variants)} query variants")
+                    # All variants are embedded in one batched request
+                    with timed("chat", "embed_query"):
+                        vectors.extend(await self.vector_db.embed_queries(variants))
+                    queries.extend(variants)
+
+            # Get relevant documents from the shared, already-loaded vector database
+            with timed("chat", "search"):
+                relevant_docs = await self.vector_db.multi_search(queries, vectors, document_ids=document_ids)
+            RETRIEVALS.inc(path="multi_query" if len(queries) > 1 else "hybrid")
+        finally:
+            if variants_task is not None and not variants_task.done():
+                variants_task.cancel()
+
+        if not relevant_docs:
+            logger.warning("No relevant documents found in vector database")
+        return vector, version, None, relevant_docs
+
+    def _build_context(self, relevant_docs: List[Document]) -> str:
+        return self.context_builder.build(relevant_docs)
+
+    @staticmethod
+    def _sources(relevant_docs: List[Document]) -> List[Dict[str, Any]]:
+        """Page citations for the chunks an answer was generated from"""
+        return [
+            {
+                "document_id": doc.metadata.get("doc_id"),
+                "filename": doc.metadata.get("source"),
+                "page_start": doc.metadata.get("page_start", doc.metadata.get("page")),
+                "page_end": doc.metadata.get("page_end", doc.metadata.get("page")),
+                "section": doc.metadata.get("section")
+            }
+            for doc in relevant_docs
+        ]
+
+    def _cache_answer(self, vector: Optional[List[float]], version: int, answer: str,
+                      relevant_docs: List[Document], document_ids: Optional[List[str]]) -> None:
+        # Answers produced without any context are not worth reusing
+        if settings.ANSWER_CACHE_ENABLED and vector is not None and relevant_docs and answer:
+            chunk_ids = [doc.metadata.get("chunk_id") for doc in relevant_docs]
+            self.answer_cache.store(vector, version, answer, chunk_ids, document_ids, self._sources(relevant_docs))
+
+    async def process_message(self, message: str, document_ids: Optional[List[str]] = None,
+                              multi_query: bool = False):
+        try:
+            with timed("chat", "total"):
+                vector, version, cached, relevant_docs = await self._retrieve(message, document_ids, multi_query)
+
+                if cached is not None:
+                    response, sources = cached["answer"], cached["sources"]
+                else:
+                    # Get the response from LLM
+                    with timed("chat", "generate"):
+                        response = await self.llm.generate_response(message, self._build_context(relevant_docs))
+                    sources = self._sources(relevant_docs)
+                    self._cache_answer(vector, version, response, relevant_docs, document_ids)
+
+                # Save to chat history
+                with timed("chat", "history_save"):
+                    chat_history = await ChatHistory.create(
+                        question=message,
+                        answer=response
+                    )
+            
+            # Return the complete response for immediate display
+            return {
+                "id": chat_history["id"],
+                "question": message,
+                "answer": response,
+                "timestamp": chat_history["timestamp"],
+                "sources": sources
+            }
+        except OverloadedError:
+            # Kept as is so the endpoint can answer 429/503 with Retry-After
+            raise
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            raise Exception(f"Error processing message: {e}")
+
+    async def stream_response(self, chat_id: str, message: str, document_ids: Optional[List[str]] = None,
+                              multi_query: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
+        """Run retrieval, then relay model tokens as they are generated.
+
+        Yields {"token": ...} items followed by a final {"chat": ...} item
+        holding the saved chat history entry. Closing the generator early
+        cancels the upstream generation and nothing is saved.
+        """
+        self.current_generation[chat_id] = True
+        running_path, stop_path = self._marker(chat_id, ".running"), self._marker(chat_id, ".stop")
+        os.makedirs(self.generations_dir, exist_ok=True)
+        self._remove_marker(stop_path)
+        open(running_path, "w").close()
+        tokens = None
+        started = time.perf_counter()
+        try:
+            vector, version, cached, relevant_docs = await self._retrieve(message, document_ids, multi_query)
+            if cached is not None:
+                answer, sources = cached["answer"], cached["sources"]
+                yield {"token": answer}
+            else:
+                sources = self._sources(relevant_docs)
+                tokens = self.llm.stream_response(message, self._build_context(relevant_docs))
+                parts = []
+                generate_started = time.perf_counter()
+                stop_checked = generate_started
+                async for token in tokens:
+                    # The stop marker is a file, so it is looked for on an interval rather than per token
+                    now = time.perf_counter()
+                    stopped = not self.current_generation.get(chat_id)
+                    if not stopped and now - stop_checked >= settings.STOP_CHECK_INTERVAL:
+                        stop_checked = now
+                        stopped = os.path.exists(stop_path)
+                    if stopped:
+                        logger.info(f"Generation {chat_id} stopped")
+                        return
+                    if not parts:
+                        STAGE_SECONDS.observe(time.perf_counter() - generate_started, pipeline="chat", stage="first_token")
+                    parts.append(token)
+                    yield {"token": token}
+                # Time spent waiting on the client between tokens is included, as the user sees it
+                STAGE_SECONDS.observe(time.perf_counter() - generate_started, pipeline="chat", stage="generate")
+                answer = "".join(parts)
+                self._cache_answer(vector, version, answer, relevant_docs, document_ids)
+
+            with timed("chat", "history_save"):
+                chat_history = await ChatHistory.create(
+                    question=message,
+                    answer=answer,
+                    chat_id=chat_id
+                )
+            STAGE_SECONDS.observe(time.perf_counter() - started, pipeline="chat", stage="total")
+            yield {"chat": {**chat_history, "sources": sources}}
+        finally:
+            if tokens is not None:
+                await tokens.aclose()
+            self.current_generation.pop(chat_id, None)
+            self._remove_marker(running_path)
+            self._remove_marker(stop_path)
+
+    def stop_generation(self, chat_id: str) -> bool:
+        """Ask an in-progress stream to stop; returns False if no worker is running it"""
+        if chat_id in self.current_generation:
+            self.current_generation[chat_id] = False
+            return True
+        if not os.path.exists(self._marker(chat_id, ".running")):
+            return False
+        # The stream is served by another worker, which checks for this file between tokens
+        open(self._marker(chat_id, ".stop"), "w").close()
+        return True
+
+    async def get_chat_history(self, limit: Optional[int] = None, before: Optional[str] = None,
+                               before_seq: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await ChatHistory.get_page(limit or settings.CHAT_HISTORY_PAGE_SIZE, before, before_seq)
+
+    async def clear_chat_history(self) -> None:
+        """Clear all chat history"""
+        try:
+            await ChatHistory.clear_all()
+        except Exception as e:
+            raise Exception(f"Error clearing chat history: {e}")
+
+_shared_service: Optional[ChatService] = None
+
+def get_chat_service() -> ChatService:
+    """Return the process-wide ChatService, creating it on first use"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = ChatService()
+    return _shared_service
\ No newline at end of file
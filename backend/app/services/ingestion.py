@@ -0,0 +1,202 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import time
+import uuid
+from ..config import settings
+from ..database.models import FileStorage
+
+if TYPE_CHECKING:
+    from .pdf import PDFService
+
+logger = logging.getLogger(__name__)
+
+# Records collection that makes job status visible to every worker process
+JOBS_COLLECTION = "ingestion_jobs"
+
+class IngestionQueueFullError(Exception):
+    """Raised when the ingestion queue has no room for another job"""
+
+class IngestionQueue:
+    """Bounded queue of PDF ingestion jobs processed by a fixed pool of workers.
+
+    Jobs run concurrently up to INGEST_WORKERS; their index writes are
+    serialized by the vector database's write lock, so concurrent uploads
+    are merged without corrupting the index. In single-document mode the
+    most recently submitted upload wins: a job that finishes after a newer
+    one has been published fails instead of replacing it. Job status is
+    also saved to SQLite, so a poll answered by another worker process
+    still finds it.
+    """
+
+    def __init__(self, pdf_service: Optional["PDFService"] = None):
+        self._pdf_service = pdf_service
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue = None
+        self._workers: List[asyncio.Task] = []
+        # Jobs changed since they were last saved, written by a single task in order
+        self._dirty = set()
+        self._writer: Optional[asyncio.Task] = None
+        self._prune_saved = False
+
+    @property
+    def pdf_service(self) -> "PDFService":
+        # Imported on first use; the PDF pipeline loads LangChain, FAISS and PyPDF2
+        if self._pdf_service is None:
+            from .pdf import get_pdf_service
+            self._pdf_service = get_pdf_service()
+        return self._pdf_service
+
+    def _start(self) -> asyncio.Queue:
+        # Started lazily so the queue and workers bind to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"ingest-worker-{i}")
+                for i in range(max(1, settings.INGEST_WORKERS))
+            ]
+        return self._queue
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.update(fields, updated_at=datetime.now().isoformat())
+            self._persist(job_id)
+
+    def _persist(self, job_id: str) -> None:
+        # Progress arrives per page; while a save is in flight further updates are coalesced
+        self._dirty.add(job_id)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_jobs())
+
+    async def _write_jobs(self) -> None:
+        if self._prune_saved:
+            self._prune_saved = False
+            cutoff = datetime.now() - timedelta(seconds=settings.INGEST_JOB_RETENTION)
+            try:
+                await FileStorage.delete_before(JOBS_COLLECTION, cutoff.isoformat())
+            except Exception as e:
+                logger.error(f"Error pruning saved ingestion jobs: {e}")
+        while self._dirty:
+            job_ids, self._dirty = self._dirty, set()
+            for job_id in job_ids:
+                job = self.get(job_id)
+                if job is None:
+                    continue
+                try:
+                    await FileStorage.save(JOBS_COLLECTION, {**job, "timestamp": job["updated_at"]})
+                except Exception as e:
+                    logger.error(f"Error saving ingestion job {job_id}: {e}")
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - settings.INGEST_JOB_RETENTION
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["finished"] is not None and job["finished"] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        # Saved jobs are pruned by the writer task that the next submission starts
+        self._prune_saved = True
+
+    def submit(self, path: str, filename: str) -> Dict[str, Any]:
+        """Queue a spooled PDF for ingestion; the job takes ownership of the file"""
+        queue = self._start()
+        self._prune()
+        now = datetime.now().isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "filename": filename,
+            "status": "queued",
+            "stage": None,
+            "pages_done": 0,
+            "total_pages": None,
+            "chunks": None,
+            "chunks_embedded": 0,
+            "document_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished": None
+        }
+        try:
+            queue.put_nowait((job["id"], path))
+        except asyncio.QueueFull:
+            raise IngestionQueueFullError("Too many PDFs are waiting to be processed, please retry later")
+        self.jobs[job["id"]] = job
+        self._persist(job["id"])
+        logger.info(f"Queued ingestion job {job['id']} for {filename} ({queue.qsize()} waiting)")
+        return self.get(job["id"])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the public view of a job, or None if it is unknown or expired"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key != "finished"}
+
+    async def find(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Like get, but also finds jobs submitted to other worker processes"""
+        job = self.get(job_id)
+        if job is None:
+            job = await FileStorage.get(JOBS_COLLECTION, job_id)
+            if job is not None:
+                job.pop("timestamp", None)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, path = await self._queue.get()
+            try:
+                await self._run(job_id, path)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, path: str) -> None:
+        job = self.jobs[job_id]
+        self._update(job_id, status="running")
+        try:
+            doc_id = await self.pdf_service.process_pdf(
+                path, job["filename"], progress=lambda **fields: self._update(job_id, **fields),
+                submitted_at=job["created_at"]
+            )
+            self._update(job_id, status="completed", stage=None, document_id=doc_id)
+            logger.info(f"Ingestion job {job_id} completed")
+        except asyncio.CancelledError:
+            self._update(job_id, status="failed", error="Cancelled during shutdown")
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            job["finished"] = time.monotonic()
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def shutdown(self) -> None:
+        """Cancel the workers; queued jobs are dropped and their files removed"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                job_id, path = self._queue.get_nowait()
+                self._update(job_id, status="failed", error="Cancelled during shutdown")
+                if os.path.exists(path):
+                    os.remove(path)
+            self._queue = None
+        # Save the final status of every job before the loop goes away
+        if self._writer is not None:
+            await asyncio.gather(self._writer, return_exceptions=True)
+
+_shared_queue: Optional[IngestionQueue] = None
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Return the process-wide ingestion queue"""
+    global _shared_queue
+    if _shared_queue is None:
+        _shared_queue = IngestionQueue()
+    return _shared_queue
@@ -1,50 +1,101 @@
-from ..core.pdf import PDFProcessor
-from ..core.vector_store import VectorDatabase
-import logging
-import os
-import shutil
-from ..config import settings
-
-logger = logging.getLogger(__name__)
-
-class PDFService:
-    def __init__(self):
-        self.pdf_processor = PDFProcessor()
-        self.vector_db = VectorDatabase()
-
-    async def process_pdf(self, content: bytes):
-        if not content:
-            logger.error("Empty PDF content received")
-            raise ValueError("Empty PDF content")
-            
-        try:
-            logger.info(f"Processing PDF content of size {len(content)} bytes")
-            
-            # Ensure we clean up the vector database first
-            await self.vector_db.cleanup()
-            
-            # Also remove any chat history to keep things clean
-            chat_history_dir = os.path.join(settings.DATA_DIR, "chat_history")
-            if os.path.exists(chat_history_dir):
-                logger.info(f"Cleaning up chat history at {chat_history_dir}")
-                for file in os.listdir(chat_history_dir):
-                    if file.endswith('.json'):
-                        os.remove(os.path.join(chat_history_dir, file))
-            
-            documents = await self.pdf_processor.load_pdf(content)
-            
-            if not documents:
-                logger.warning("No text content extracted from PDF")
-                raise ValueError("Could not extract text from PDF. The file might be empty or password-protected.")
-                
-            logger.info(f"Extracted {len(documents)} document chunks from PDF")
-            chunks = await self.pdf_processor.split_docs(documents)
-            
-            logger.info(f"Split into {len(chunks)} chunks, storing in vector database")
-            await self.vector_db.create_db(chunks)
-            
-            logger.info("PDF processing completed successfully")
-            return True
-        except Exception as e:
-            logger.error(f"Error processing PDF: {e}")
-            raise
\ No newline at end of file
+from ..core.pdf import PDFProcessor
+from ..core.metrics import STAGE_SECONDS, timed
+from ..core.vector_store import get_vector_db
+from ..database.models import ChatHistory
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from langchain.schema import Document
+from datetime import datetime
+import logging
+import os
+import shutil
+import time
+import uuid
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class PDFService:
+    def __init__(self):
+        self.pdf_processor = PDFProcessor()
+        self.vector_db = get_vector_db()
+
+    @staticmethod
+    async def _track_pages(pages: AsyncIterator[Document], progress: Callable[..., None]) -> AsyncIterator[Document]:
+        async for page in pages:
+            progress(pages_done=page.metadata["page"], total_pages=page.metadata["total_pages"])
+            yield page
+
+    async def process_pdf(self, path: str, filename: Optional[str] = None,
+                          progress: Optional[Callable[..., None]] = None,
+                          submitted_at: Optional[str] = None) -> str:
+        """Index a PDF and return its document ID.
+
+        progress, if given, is called with keyword updates (stage, pages_done,
+        total_pages, chunks, chunks_embedded) as the pipeline advances.
+        submitted_at orders uploads in single-document mode; it defaults to now.
+        """
+        submitted_at = submitted_at or datetime.now().isoformat()
+        progress = progress or (lambda **fields: None)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            logger.error("Empty PDF content received")
+            raise ValueError("Empty PDF content")
+            
+        started = time.perf_counter()
+        try:
+            logger.info(f"Processing PDF file {path} of size {os.path.getsize(path)} bytes")
+            doc_id = uuid.uuid4().hex
+            # In single-document mode a new upload replaces the corpus
+            replace = not settings.MULTI_DOCUMENT
+            
+            # Pages are streamed from the extraction workers straight into the splitter,
+            # so extraction and splitting are timed as one stage
+            progress(stage="extracting")
+            with timed("upload", "extract_split"):
+                pages = self._track_pages(self.pdf_processor.iter_pages(path), progress)
+                chunks = await self.pdf_processor.split_docs(pages)
+            
+            if not chunks:
+                logger.warning("No text content extracted from PDF")
+                raise ValueError("Could not extract text from PDF. The file might be empty or password-protected.")
+                
+            logger.info(f"Split into {len(chunks)} chunks, storing in vector database")
+            for chunk in chunks:
+                chunk.metadata["source"] = filename
+            info = {
+                "filename": filename,
+                "pages": chunks[0].metadata.get("total_pages"),
+                "created_at": datetime.now().isoformat(),
+                "submitted_at": submitted_at
+            }
+            progress(stage="embedding", chunks=len(chunks), chunks_embedded=0)
+            # The previous index keeps serving searches until the new one is published
+            await self.vector_db.add_document(
+                doc_id, chunks, info, replace=replace,
+                progress=lambda embedded: progress(chunks_embedded=embedded)
+            )
+            if replace:
+                # Also remove any chat history to keep things clean
+                await ChatHistory.clear_all()
+            
+            logger.info(f"PDF processing completed successfully, document ID {doc_id}")
+            return doc_id
+        except Exception as e:
+            logger.error(f"Error processing PDF: {e}")
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, pipeline="upload", stage="total")
+
+    async def list_documents(self) -> List[Dict[str, Any]]:
+        return await self.vector_db.list_documents()
+
+    async def delete_document(self, doc_id: str) -> bool:
+        return await self.vector_db.delete_document(doc_id)
+
+_shared_service: Optional[PDFService] = None
+
+def get_pdf_service() -> PDFService:
+    """Return the process-wide PDFService, creating it on first use"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = PDFService()
+    return _shared_service
\ No newline at end of file
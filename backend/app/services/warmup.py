@@ -0,0 +1,90 @@
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import httpx
+import logging
+import time
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+def _import_services() -> None:
+    # These pull in LangChain, FAISS and PyPDF2, which is most of the startup cost
+    from . import chat, pdf  # noqa: F401
+
+def _tagged(model: str) -> str:
+    # Ollama lists models with their tag
+    return model if ":" in model else f"{model}:latest"
+
+class Warmup:
+    """Optional background warm-up and the readiness state reported by /api/ready.
+
+    The app starts without importing the retrieval stack. With PREWARM set,
+    a background task imports it, loads the index and has Ollama load both
+    models, retrying until it succeeds; /api/health answers throughout.
+    """
+
+    def __init__(self):
+        self.status = "pending" if settings.PREWARM else "disabled"
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if settings.PREWARM and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="prewarm")
+
+    async def _warm(self) -> None:
+        await asyncio.to_thread(_import_services)
+        from .chat import get_chat_service
+        chat_service = get_chat_service()
+        await asyncio.gather(chat_service.vector_db.warm_up(), chat_service.llm.load_model())
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        self.status = "running"
+        while True:
+            try:
+                await self._warm()
+                break
+            except Exception as e:
+                self.error = str(e)
+                logger.warning(f"Warm-up failed, retrying in {settings.PREWARM_RETRY_INTERVAL}s: {e}")
+                await asyncio.sleep(settings.PREWARM_RETRY_INTERVAL)
+        self.status = "ready"
+        self.error = None
+        self.seconds = round(time.perf_counter() - started, 3)
+        logger.info(f"Warm-up completed in {self.seconds}s")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def check(self) -> Tuple[bool, Dict[str, Any]]:
+        """Ready when Ollama answers, has both models, and warm-up (if enabled) is done"""
+        checks: Dict[str, Any] = {"warmup": self.status, "warmup_seconds": self.seconds}
+        models = (settings.MODEL_NAME, settings.EMBEDDING_MODEL)
+        try:
+            async with httpx.AsyncClient(base_url=settings.OLLAMA_BASE_URL, timeout=settings.READY_TIMEOUT) as client:
+                response = await client.get("/api/tags")
+                response.raise_for_status()
+            available = {model.get("name") for model in response.json().get("models", [])}
+            checks["ollama"] = True
+            checks["models"] = {model: _tagged(model) in available for model in models}
+        except Exception as e:
+            checks["ollama"] = False
+            checks["models"] = {model: False for model in models}
+            checks["error"] = f"Ollama is not reachable: {e}"
+        if self.error and "error" not in checks:
+            checks["error"] = self.error
+        ready = checks["ollama"] and all(checks["models"].values()) and self.status in ("ready", "disabled")
+        return ready, checks
+
+_shared_warmup: Optional[Warmup] = None
+
+def get_warmup() -> Warmup:
+    """Return the process-wide warm-up state"""
+    global _shared_warmup
+    if _shared_warmup is None:
+        _shared_warmup = Warmup()
+    return _shared_warmup
@@ -0,0 +1,60 @@
+"""Measure ingest embedding throughput against the fake Ollama server.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_embedding --chunks 2000 --concurrency 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    parser.add_argument("--item-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    from .fake_ollama import FakeOllamaServer
+
+    fake = FakeOllamaServer(request_latency=args.request_latency, item_latency=args.item_latency).start()
+    os.environ["OLLAMA_BASE_URL"] = fake.base_url
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-embedding-")
+
+    from langchain.schema import Document
+    from app.config import settings
+    from app.core.embedding_cache import EmbeddingCache
+    from app.core.vector_store import VectorDatabase
+
+    documents = [Document(page_content=f"chunk {i} " + "lorem ipsum " * 50) for i in range(args.chunks)]
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            settings.EMBEDDING_BATCH_SIZE = args.batch_size
+            settings.EMBEDDING_CONCURRENCY = concurrency
+            EmbeddingCache().clear()
+            db = VectorDatabase()
+            requests_before = fake.requests
+            start = time.perf_counter()
+            asyncio.run(db.create_db(documents))
+            elapsed = time.perf_counter() - start
+            results.append({
+                "chunks": args.chunks,
+                "batch_size": args.batch_size,
+                "concurrency": concurrency,
+                "seconds": round(elapsed, 3),
+                "chunks_per_second": round(args.chunks / elapsed, 1),
+                "ollama_requests": fake.requests - requests_before
+            })
+    finally:
+        fake.stop()
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""End-to-end RAG benchmark against the fake Ollama server.
+
+Drives /api/pdf/upload and /api/chat/send in-process with synthetic PDFs and
+concurrent question load, and prints machine-readable results. Run from the
+backend directory:
+
+    python -m benchmarks.bench_rag --pages 10 100 --questions 200 --concurrency 8 --output run.json
+
+Questions that name a part number are answered by the lexical fast path;
+natural-language ones go through embedding and hybrid search. By default
+the two alternate; pick one kind with --question-kind, or pass
+--no-fast-path to send every question through the dense and hybrid path.
+
+Compare two runs with benchmarks.compare.
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import numpy as np
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    values = np.array(samples) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "mean": round(float(values.mean()), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def make_questions(count: int, pages: int, lines_per_page: int, kind: str) -> List[str]:
+    from .synthetic_pdf import WORDS, part_number
+
+    questions = []
+    for i in range(count):
+        if kind == "part" or (kind == "mixed" and i % 2 == 0):
+            questions.append(f"What does {part_number(i % pages, (i * 7) % lines_per_page)} refer to?")
+        else:
+            first, second = WORDS[i % len(WORDS)], WORDS[(i * 5 + 3) % len(WORDS)]
+            questions.append(f"How often should the {first} {second} be checked during maintenance?")
+    return questions
+
+def _retrieval_paths(before: Dict[Any, float]) -> Dict[str, int]:
+    from app.core.metrics import RETRIEVALS
+
+    return {
+        dict(key).get("path", ""): int(value - before.get(key, 0))
+        for key, value in RETRIEVALS._values.items() if value - before.get(key, 0)
+    }
+
+def _peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+async def run_pages(client, chat_service, pages: int, args) -> Dict[str, Any]:
+    from app.core.embedding_cache import EmbeddingCache
+    from app.core.metrics import RETRIEVALS
+    from .synthetic_pdf import make_pdf
+
+    if not args.warm_cache:
+        EmbeddingCache().clear()
+    pdf = make_pdf(pages, lines_per_page=args.lines_per_page, seed=args.seed)
+
+    start = time.perf_counter()
+    response = await client.post("/api/pdf/upload", files={"file": ("bench.pdf", pdf, "application/pdf")})
+    response.raise_for_status()
+    job = response.json()["job"]
+    while job["status"] not in ("completed", "failed"):
+        await asyncio.sleep(0.05)
+        job = (await client.get(f"/api/pdf/jobs/{job['id']}")).json()
+    ingest_seconds = time.perf_counter() - start
+    if job["status"] == "failed":
+        raise RuntimeError(f"Ingestion failed: {job['error']}")
+
+    retrieval: List[float] = []
+    original_retrieve = chat_service._retrieve
+
+    async def timed_retrieve(*a, **kw):
+        began = time.perf_counter()
+        try:
+            return await original_retrieve(*a, **kw)
+        finally:
+            retrieval.append(time.perf_counter() - began)
+
+    chat_service._retrieve = timed_retrieve
+    end_to_end: List[float] = []
+    errors = 0
+    questions = make_questions(args.questions, pages, args.lines_per_page, args.question_kind)
+    paths_before = dict(RETRIEVALS._values)
+    queue: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        queue.put_nowait(question)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            question = queue.get_nowait()
+            began = time.perf_counter()
+            reply = await client.post("/api/chat/send", json={"content": question})
+            end_to_end.append(time.perf_counter() - began)
+            if reply.status_code != 200:
+                errors += 1
+
+    load_start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    finally:
+        chat_service._retrieve = original_retrieve
+    load_seconds = time.perf_counter() - load_start
+
+    return {
+        "pages": pages,
+        "pdf_bytes": len(pdf),
+        "ingest": {
+            "seconds": round(ingest_seconds, 3),
+            "pages_per_second": round(pages / ingest_seconds, 2),
+        },
+        "questions": len(questions),
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "throughput_qps": round(len(questions) / load_seconds, 2),
+        "retrieval_paths": _retrieval_paths(paths_before),
+        "retrieval_ms": _percentiles(retrieval),
+        "end_to_end_ms": _percentiles(end_to_end),
+    }
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    from app.services.chat import get_chat_service
+    from app.config import settings
+    from app.main import app
+
+    settings.ANSWER_CACHE_ENABLED = args.answer_cache
+    settings.LEXICAL_FAST_PATH = not args.no_fast_path
+    transport = httpx.ASGITransport(app=app)
+    runs = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for pages in args.pages:
+            runs.append(await run_pages(client, get_chat_service(), pages, args))
+    return {"runs": runs}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end RAG benchmark")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    parser.add_argument("--item-latency", type=float, default=0.002)
+    parser.add_argument("--prompt-char-latency", type=float, default=0.00001)
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--question-kind", choices=["mixed", "part", "natural"], default="mixed",
+                        help="Part-number questions, natural-language questions, or alternate between them")
+    parser.add_argument("--no-fast-path", action="store_true", help="Disable the lexical fast path")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the semantic answer cache enabled")
+    parser.add_argument("--warm-cache", action="store_true", help="Keep the embedding cache between runs")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    from .fake_ollama import FakeOllamaServer
+
+    fake = FakeOllamaServer(
+        dims=args.dims, request_latency=args.request_latency, item_latency=args.item_latency,
+        prompt_char_latency=args.prompt_char_latency, token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens
+    ).start()
+    # Settings are read at import time, so the environment must be ready before importing the app
+    os.environ["OLLAMA_BASE_URL"] = fake.base_url
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-rag-")
+
+    from app.core.pdf import shutdown_executor
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutdown_executor(wait=True)
+        fake.stop()
+
+    results["config"] = {key: value for key, value in vars(args).items() if key != "output"}
+    results["environment"] = {"python": platform.python_version(), "platform": platform.platform()}
+    results["peak_rss_mb"] = {
+        "api_process": _peak_rss_mb(resource.RUSAGE_SELF),
+        "pdf_workers": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
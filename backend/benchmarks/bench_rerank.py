@@ -0,0 +1,86 @@
+"""Measure the cost of re-ranking retrieved candidates.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_rerank --candidates 10 25 50 100 200 --dims 1024
+
+For each candidate count it times the NumPy scoring and MMR selection on
+its own, and the whole stage as search runs it: reading the candidate
+vectors back from a flat FAISS index, computing term overlap from a BM25
+index, then scoring.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--dims", type=int, default=1024)
+    parser.add_argument("--corpus", type=int, default=20000, help="Vectors in the index candidates are read from")
+    parser.add_argument("--queries", type=int, default=1, help="Query vectors (more with multi-query retrieval)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    import faiss
+    import numpy as np
+    from langchain.schema import Document
+    from app.core.index_factory import reconstruct_positions
+    from app.core.lexical import BM25Index, MmapBM25Index
+    from app.core.rerank import rerank
+
+    rng = np.random.default_rng(0)
+    words = [f"term{i}" for i in range(2000)]
+    picker = random.Random(0)
+    vectors = rng.standard_normal((args.corpus, args.dims)).astype(np.float32)
+    index = faiss.IndexFlatL2(args.dims)
+    index.add(vectors)
+    chunk_ids = [f"chunk-{i}" for i in range(args.corpus)]
+    builder = BM25Index()
+    builder.add(
+        Document(page_content=" ".join(picker.choices(words, k=120)), metadata={"chunk_id": chunk_id})
+        for chunk_id in chunk_ids
+    )
+    lexical = MmapBM25Index.from_index(builder)
+    queries = [" ".join(picker.choices(words, k=8)) for _ in range(args.queries)]
+    query_vectors = rng.standard_normal((args.queries, args.dims)).astype(np.float32)
+
+    results: List[Dict[str, Any]] = []
+    for count in args.candidates:
+        positions = rng.choice(args.corpus, size=count, replace=False).astype(np.int64)
+        pool = [chunk_ids[position] for position in positions]
+        candidate_vectors = reconstruct_positions(index, positions)
+        overlap = lexical.term_overlap(queries, pool)
+
+        def stage() -> None:
+            rerank(query_vectors, reconstruct_positions(index, positions), lexical.term_overlap(queries, pool), args.k)
+
+        results.append({
+            "candidates": count,
+            "dims": args.dims,
+            "queries": args.queries,
+            "k": args.k,
+            "score_and_select": _time(lambda: rerank(query_vectors, candidate_vectors, overlap, args.k), args.repeat),
+            "full_stage": _time(stage, args.repeat)
+        })
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
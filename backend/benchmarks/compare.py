@@ -0,0 +1,37 @@
+"""Compare two bench_rag JSON results.
+
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+from typing import Any, Dict, Iterator, Tuple
+import argparse
+import json
+
+def _metrics(run: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    yield "ingest.pages_per_second", run["ingest"]["pages_per_second"]
+    yield "throughput_qps", run["throughput_qps"]
+    for group in ("retrieval_ms", "end_to_end_ms"):
+        for name, value in run.get(group, {}).items():
+            yield f"{group}.{name}", value
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark runs")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = {run["pages"]: run for run in json.load(f)["runs"]}
+    with open(args.candidate) as f:
+        candidate = {run["pages"]: run for run in json.load(f)["runs"]}
+
+    print(f"{'pages':>6}  {'metric':<26} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for pages in sorted(set(baseline) & set(candidate)):
+        before = dict(_metrics(baseline[pages]))
+        for name, value in _metrics(candidate[pages]):
+            if name not in before:
+                continue
+            change = (value - before[name]) / before[name] * 100 if before[name] else 0.0
+            print(f"{pages:>6}  {name:<26} {before[name]:>12.2f} {value:>12.2f} {change:>8.1f}%")
+
+if __name__ == "__main__":
+    main()
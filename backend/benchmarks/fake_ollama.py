@@ -0,0 +1,174 @@
+"""Deterministic stand-in for the Ollama HTTP API used by the benchmarks.
+
+Vectors and answers are derived from a hash of the input text, so repeated
+runs produce identical indexes and responses. Latency is simulated per
+request, per embedded item, per prompt character and per generated token.
+Like Ollama, the prefix shared with the previous prompt is not re-evaluated.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Sequence
+import argparse
+import hashlib
+import os
+import json
+import random
+import threading
+import time
+
+def fake_embedding(text: str, dims: int) -> List[float]:
+    """Return a unit-length pseudo-random vector seeded by the text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+    norm = sum(x * x for x in vector) ** 0.5 or 1.0
+    return [x / norm for x in vector]
+
+def fake_answer(prompt: str, tokens: int) -> List[str]:
+    """Return a deterministic list of answer tokens for a prompt"""
+    words = ["the", "document", "states", "that", "value", "is", "described", "on", "page", "section"]
+    seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.choice(words) + " " for _ in range(tokens)]
+
+class FakeOllamaServer:
+    """Threaded HTTP server answering the Ollama endpoints used by the app"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dims: int = 256,
+                 request_latency: float = 0.02, item_latency: float = 0.002,
+                 prompt_char_latency: float = 0.00001, token_latency: float = 0.01,
+                 answer_tokens: int = 40,
+                 models: Sequence[str] = ("llama3.2:latest", "mxbai-embed-large:latest")):
+        self.dims = dims
+        self.request_latency = request_latency
+        self.item_latency = item_latency
+        self.prompt_char_latency = prompt_char_latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        # Reported by /api/tags as the pulled models
+        self.models = list(models)
+        self.requests = 0
+        self.last_prompt = ""
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _generate(self, payload) -> None:
+                prompt = payload.get("prompt", "")
+                if not prompt:
+                    # Like Ollama, an empty prompt only loads the model
+                    self._send_json({"model": payload.get("model"), "response": "", "done": True})
+                    return
+                tokens = fake_answer(prompt, server.answer_tokens)
+                with server._lock:
+                    reused = len(os.path.commonprefix([server.last_prompt, prompt]))
+                    server.last_prompt = prompt
+                # Prompt evaluation cost grows with the part of the prompt not already cached,
+                # as on a CPU-bound model
+                evaluated = len(prompt) - reused
+                time.sleep(server.request_latency + server.prompt_char_latency * evaluated)
+                counts = {"eval_count": len(tokens), "prompt_eval_count": -(-evaluated // 4)}
+                if not payload.get("stream", True):
+                    time.sleep(server.token_latency * len(tokens))
+                    self._send_json({"model": payload.get("model"), "response": "".join(tokens), "done": True,
+                                     **counts})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        time.sleep(server.token_latency)
+                        self._write_chunk({"model": payload.get("model"), "response": token, "done": False})
+                    self._write_chunk({"model": payload.get("model"), "response": "", "done": True,
+                                      **counts})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away, so generation stops like it does in Ollama
+                    pass
+
+            def _write_chunk(self, payload) -> None:
+                line = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": name, "model": name} for name in server.models]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+
+                if self.path == "/api/embed":
+                    inputs = payload.get("input", [])
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    time.sleep(server.request_latency + server.item_latency * len(inputs))
+                    self._send_json({
+                        "model": payload.get("model"),
+                        "embeddings": [fake_embedding(text, server.dims) for text in inputs]
+                    })
+                elif self.path == "/api/embeddings":
+                    time.sleep(server.request_latency + server.item_latency)
+                    self._send_json({"embedding": fake_embedding(payload.get("prompt", ""), server.dims)})
+                elif self.path == "/api/generate":
+                    self._generate(payload)
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--request-latency", type=float, default=0.02)
+    parser.add_argument("--item-latency", type=float, default=0.002)
+    parser.add_argument("--prompt-char-latency", type=float, default=0.00001)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    fake = FakeOllamaServer(port=args.port, dims=args.dims, request_latency=args.request_latency,
+                            item_latency=args.item_latency, prompt_char_latency=args.prompt_char_latency,
+                            token_latency=args.token_latency, answer_tokens=args.answer_tokens)
+    print(f"Fake Ollama listening on {fake.base_url}")
+    fake.httpd.serve_forever()
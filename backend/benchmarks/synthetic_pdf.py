@@ -0,0 +1,53 @@
+"""Generate deterministic text PDFs for the benchmarks without extra dependencies."""
+from typing import List
+import random
+
+WORDS = [
+    "pump", "valve", "pressure", "torque", "assembly", "bracket", "sensor", "housing",
+    "maintenance", "inspection", "interval", "replace", "tighten", "calibrate", "voltage",
+    "filter", "seal", "bearing", "shaft", "coupling", "manual", "procedure", "warning",
+]
+
+def part_number(page: int, line: int) -> str:
+    """Identifier planted on every line so questions have an exact answer location"""
+    return f"PN-{page:04d}-{line:02d}"
+
+def page_lines(page: int, lines_per_page: int, rng: random.Random) -> List[str]:
+    lines = [f"Section {page + 1}: {rng.choice(WORDS).title()} {rng.choice(WORDS)}"]
+    for line in range(lines_per_page):
+        words = " ".join(rng.choice(WORDS) for _ in range(10))
+        lines.append(f"{part_number(page, line)} {words}.")
+    return lines
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """Return a PDF with one text page per requested page"""
+    rng = random.Random(seed)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page in range(pages):
+        text = " ".join(f"({_escape(line)}) '" for line in page_lines(page, lines_per_page, rng))
+        stream = f"BT /F1 9 Tf 36 760 Td 11 TL {text} ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(out)
@@ -1,11 +1,31 @@
-import uvicorn
-import os
-
-if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+import argparse
+import uvicorn
+import os
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PDF Chat API")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Production mode: run this many worker processes without auto-reload")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        # Each worker has its own PDF extraction pool; share the cores between them
+        # unless PDF_WORKERS is set explicitly
+        os.environ.setdefault("PDF_WORKERS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+# Run from the backend directory or the repository root alike
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from benchmarks.fake_ollama import FakeOllamaServer
+
+@pytest.fixture(scope="session")
+def fake_ollama():
+    server = FakeOllamaServer(dims=32, request_latency=0.0, item_latency=0.0).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, fake_ollama):
+    """Point the app at an empty data directory and the fake Ollama server"""
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "OLLAMA_BASE_URL", fake_ollama.base_url)
+    return tmp_path
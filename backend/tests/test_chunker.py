@@ -0,0 +1,33 @@
+from langchain.schema import Document
+from app.core.chunker import StructuredChunker, _is_heading, page_blocks
+
+BODY = "The pump housing bolts are tightened in a cross pattern to the listed torque."
+
+def _chunk(pages, chunk_size=400):
+    chunker = StructuredChunker(chunk_size, 0)
+    chunks = []
+    for number, text in enumerate(pages, 1):
+        chunks.extend(chunker.feed(Document(page_content=text, metadata={"page": number})))
+    return chunks + chunker.finish()
+
+def test_page_numbers_are_not_headings():
+    for line in ("Page 1 of 4", "PAGE 12", "Service Manual Rev B 3 of 12"):
+        assert not _is_heading(line)
+    for line in ("Safety Instructions", "2.1 Torque Values", "APPENDIX A"):
+        assert _is_heading(line)
+
+def test_running_header_is_not_a_section():
+    pages = [f"Acme Pump Service Manual\n\n{title}\n\n{BODY}" for title in ("Installation", "Maintenance", "Repair")]
+    chunks = _chunk(pages)
+    sections = {chunk.metadata["section"] for chunk in chunks}
+    assert sections == {"Installation", "Maintenance", "Repair"}
+    assert [block.kind for block in page_blocks(pages[1], 2, {"Acme Pump Service Manual"})] == ["text", "heading", "text"]
+
+def test_trailing_heading_is_not_emitted_alone():
+    chunks = _chunk([f"Overview\n\n{BODY}\n\nSpare Parts"])
+    assert len(chunks) == 1
+    assert chunks[0].metadata["section"] == "Overview"
+    assert all(chunk.page_content != "Spare Parts" for chunk in chunks)
+
+def test_heading_only_document_yields_nothing():
+    assert _chunk(["Contents"]) == []
@@ -0,0 +1,49 @@
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from app.core.docstore import MmapDocstore, OverlayDocstore, has_docstore, write_docstore
+
+def _documents(prefix, count):
+    return {
+        f"{prefix}-{i}": Document(page_content=f"{prefix} text {i} é", metadata={"chunk_id": f"{prefix}-{i}", "page": i})
+        for i in range(count)
+    }
+
+def _write(path, documents):
+    ids = list(documents)
+    write_docstore(str(path), InMemoryDocstore(documents), dict(enumerate(ids)))
+    return MmapDocstore(str(path))
+
+def test_round_trip(tmp_path):
+    documents = _documents("a", 5)
+    docstore = _write(tmp_path, documents)
+
+    assert has_docstore(str(tmp_path))
+    assert len(docstore) == 5
+    assert dict(docstore.index_to_docstore_id()) == dict(enumerate(documents))
+    for position, (id_, document) in enumerate(documents.items()):
+        assert docstore.search(id_) == document
+        assert docstore.get(position) == document
+    assert docstore.positions(["a-3", "missing", "a-0"]).tolist() == [3, -1, 0]
+    assert docstore.search("missing") == "ID missing not found."
+
+def test_overlay_saves_changes_and_copies_the_rest(tmp_path):
+    base_path, saved_path = tmp_path / "base", tmp_path / "saved"
+    base_path.mkdir()
+    saved_path.mkdir()
+    documents = _documents("a", 6)
+    overlay = OverlayDocstore(_write(base_path, documents))
+
+    added = _documents("b", 2)
+    overlay.add(added)
+    overlay.delete(["a-1", "a-4"])
+    assert overlay.search("a-1") == "ID a-1 not found."
+    assert overlay.search("b-0") == added["b-0"]
+    assert overlay.search("a-2") == documents["a-2"]
+
+    # Positions are reordered the way a rebuilt FAISS index reorders them
+    ids = ["a-0", "b-1", "a-2", "a-3", "a-5", "b-0"]
+    write_docstore(str(saved_path), overlay, dict(enumerate(ids)))
+    saved = MmapDocstore(str(saved_path))
+    expected = {**documents, **added}
+    assert [saved.get(position) for position in range(len(ids))] == [expected[id_] for id_ in ids]
+    assert saved.positions(["a-1", "b-0"]).tolist() == [-1, 5]
@@ -0,0 +1,49 @@
+from langchain.schema import Document
+from app.core.lexical import BM25Index, MmapBM25Index, has_lexical
+
+def _chunks(doc_id, texts):
+    return [
+        Document(page_content=text, metadata={"chunk_id": f"{doc_id}-{i}", "doc_id": doc_id})
+        for i, text in enumerate(texts)
+    ]
+
+FIRST = _chunks("d1", ["pump housing torque PN-0001-01", "valve seal inspection", "pump bearing shaft"])
+SECOND = _chunks("d2", ["valve torque procedure", "sensor voltage calibrate M8x1.25"])
+
+def _index(chunks):
+    builder = BM25Index()
+    builder.add(chunks)
+    return MmapBM25Index.from_index(builder)
+
+def _rounded(hits):
+    return [(chunk_id, round(score, 9)) for chunk_id, score in hits]
+
+def test_save_and_load(tmp_path):
+    index = _index(FIRST + SECOND)
+    index.save(str(tmp_path))
+    loaded = MmapBM25Index.load(str(tmp_path))
+
+    assert has_lexical(str(tmp_path))
+    assert len(loaded) == 5
+    for query in ("pump torque", "valve", "m8x1.25 voltage", "unknown"):
+        assert _rounded(loaded.search(query, 3)) == _rounded(index.search(query, 3))
+    assert [chunk_id for chunk_id, _ in loaded.search("torque", 5, ["d2"])] == ["d2-0"]
+    assert loaded.identifiers_matched("what is PN-0001-01", "d1-0")
+    assert not loaded.identifiers_matched("what is PN-0001-01", "d1-1")
+    assert loaded.chunk_ids_of("d2") == ["d2-0", "d2-1"]
+
+def test_merge_and_without_match_a_fresh_build():
+    merged = _index(FIRST).merge(_index(SECOND))
+    combined = _index(FIRST + SECOND)
+    for query in ("pump torque", "valve seal", "calibrate"):
+        assert _rounded(merged.search(query, 5)) == _rounded(combined.search(query, 5))
+    assert merged.term_overlap(["valve torque"], ["d1-1", "d2-0"]) == combined.term_overlap(
+        ["valve torque"], ["d1-1", "d2-0"]
+    )
+
+    removed = merged.without(merged.chunk_ids_of("d1"))
+    alone = _index(SECOND)
+    assert len(removed) == 2
+    assert removed.chunk_ids_of("d1") == []
+    for query in ("valve torque", "pump"):
+        assert _rounded(removed.search(query, 5)) == _rounded(alone.search(query, 5))
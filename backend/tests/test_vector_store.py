@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from langchain.schema import Document
+from app.core.docstore import MmapDocstore
+from app.core.lexical import MmapBM25Index
+from app.core.vector_store import VectorDatabase
+
+def _chunks(doc_id, count):
+    return [Document(page_content=f"{doc_id}token chunk {i}", metadata={"page": i}) for i in range(count)]
+
+async def _add(vector_db, doc_id, count=10):
+    await vector_db.add_document(doc_id, _chunks(doc_id, count), {"filename": f"{doc_id}.pdf"})
+
+def _check_consistent(vector_db, db):
+    docstore = db.docstore
+    assert isinstance(docstore, MmapDocstore)
+    assert isinstance(vector_db._lexical, MmapBM25Index)
+    assert len(docstore) == db.index.ntotal == len(vector_db._lexical)
+    for position, chunk_id in db.index_to_docstore_id.items():
+        assert docstore.get(position).metadata["chunk_id"] == chunk_id
+
+def test_add_delete_and_reload(data_dir):
+    async def run():
+        writer = VectorDatabase()
+        for doc_id in ("alpha", "beta", "gamma"):
+            await _add(writer, doc_id)
+        assert await writer.delete_document("beta")
+        assert not await writer.delete_document("beta")
+
+        reader = VectorDatabase()
+        db = await reader.get_db()
+        assert sorted(document["id"] for document in await reader.list_documents()) == ["alpha", "gamma"]
+        assert db.index.ntotal == 20
+        assert reader.version == writer.version == 4
+        _check_consistent(reader, db)
+        hits = reader._lexical.search("gammatoken", 20)
+        assert sorted(chunk_id for chunk_id, _ in hits) == sorted(reader._lexical.chunk_ids_of("gamma"))
+        assert len(hits) == 10
+        assert reader._lexical.search("betatoken", 20) == []
+
+        # A writer's publish is picked up through the version file
+        await _add(writer, "delta", 5)
+        db = await reader.get_db()
+        assert db.index.ntotal == 25
+        assert reader.version == 5
+        _check_consistent(reader, db)
+
+    asyncio.run(run())
+
+def test_deleting_the_last_document_empties_the_index(data_dir):
+    async def run():
+        writer = VectorDatabase()
+        await _add(writer, "alpha")
+        assert await writer.delete_document("alpha")
+        reader = VectorDatabase()
+        assert await reader.get_db() is None
+        assert await reader.list_documents() == []
+
+    asyncio.run(run())
+
+def test_failed_load_keeps_the_corpus(data_dir):
+    async def run():
+        writer = VectorDatabase()
+        for doc_id in ("alpha", "beta"):
+            await _add(writer, doc_id)
+
+        flaky = VectorDatabase()
+        open_index = flaky._open
+        calls = []
+
+        def fail_once():
+            calls.append(None)
+            if len(calls) == 1:
+                raise OSError("transient read error")
+            return open_index()
+
+        flaky._open = fail_once
+        with pytest.raises(OSError):
+            await _add(flaky, "gamma")
+        assert not flaky._loaded
+
+        await _add(flaky, "gamma")
+        reader = VectorDatabase()
+        db = await reader.get_db()
+        assert sorted(document["id"] for document in await reader.list_documents()) == ["alpha", "beta", "gamma"]
+        assert db.index.ntotal == 30
+
+    asyncio.run(run())
+
+def test_search_within_documents(data_dir):
+    async def run():
+        vector_db = VectorDatabase()
+        for doc_id in ("alpha", "beta", "gamma"):
+            await _add(vector_db, doc_id)
+        queries = ["betatoken chunk 3", "chunk 4"]
+        vectors = await vector_db.embed_queries(queries)
+        found = await vector_db.multi_search(queries, vectors, 5, ["beta", "gamma"])
+        assert len(found) == 5
+        assert {document.metadata["doc_id"] for document in found} <= {"beta", "gamma"}
+        assert all(isinstance(document, Document) for document in found)
+
+    asyncio.run(run())
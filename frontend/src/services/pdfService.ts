@@ -1,34 +1,71 @@
-import api from './api';
-
-export const uploadPdf = async (file: File): Promise<boolean> => {
-  try {
-    const formData = new FormData();
-    formData.append('file', file);
-
-    const response = await api.post('/pdf/upload', formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data',
-      },
-    });
-
-    if (response.status === 200) {
-      // Return true to indicate success
-      return true;
-    }
-
-    throw new Error(`Server returned ${response.status}: ${response.data.detail || 'Unknown error'}`);
-  } catch (error: any) {
-    console.error('Error uploading PDF:', error);
-    if (error.response) {
-      // The request was made and the server responded with a status code
-      // that falls out of the range of 2xx
-      throw new Error(error.response.data.detail || `Server error: ${error.response.status}`);
-    } else if (error.request) {
-      // The request was made but no response was received
-      throw new Error('No response received from server. Please check your connection.');
-    } else {
-      // Something happened in setting up the request
-      throw error;
-    }
-  }
-};
\ No newline at end of file
+import api from './api';
+
+export interface IngestionJob {
+  id: string;
+  filename: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  stage: 'extracting' | 'embedding' | null;
+  pages_done: number;
+  total_pages: number | null;
+  chunks: number | null;
+  chunks_embedded: number;
+  document_id: string | null;
+  error: string | null;
+}
+
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export const getJob = async (jobId: string): Promise<IngestionJob> => {
+  const response = await api.get(`/pdf/jobs/${jobId}`);
+  return response.data;
+};
+
+export const uploadPdf = async (
+  file: File,
+  onProgress?: (job: IngestionJob) => void
+): Promise<boolean> => {
+  try {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const response = await api.post('/pdf/upload', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+
+    if (response.status !== 202) {
+      throw new Error(`Server returned ${response.status}: ${response.data.detail || 'Unknown error'}`);
+    }
+
+    // The PDF is processed in the background; poll the job until it finishes
+    let job: IngestionJob = response.data.job;
+    while (job.status === 'queued' || job.status === 'running') {
+      onProgress?.(job);
+      await sleep(POLL_INTERVAL_MS);
+      job = await getJob(job.id);
+    }
+    onProgress?.(job);
+
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Failed to process PDF');
+    }
+    // Return true to indicate success
+    return true;
+  } catch (error: any) {
+    console.error('Error uploading PDF:', error);
+    if (error.response) {
+      // The request was made and the server responded with a status code
+      // that falls out of the range of 2xx
+      throw new Error(error.response.data.detail || `Server error: ${error.response.status}`);
+    } else if (error.request) {
+      // The request was made but no response was received
+      throw new Error('No response received from server. Please check your connection.');
+    } else {
+      // Something happened in setting up the request
+      throw error;
+    }
+  }
+};